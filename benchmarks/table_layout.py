@@ -0,0 +1,54 @@
+"""Times TableMaker column fitting for tables with 10 to 200 columns.
+
+Run with ``python benchmarks/table_layout.py``. Only the layout is timed,
+the table is not drawn.
+"""
+import time
+
+import numpy as np
+
+from jupyter_to_medium._matplotlib_table import TableMaker, wrap_text
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda".split()
+
+
+def make_html(num_rows, num_cols, seed=0):
+    rng = np.random.default_rng(seed)
+    header = "".join(f"<th>column_{j}</th>" for j in range(num_cols))
+    rows = []
+    for i in range(num_rows):
+        cells = []
+        for j in range(num_cols):
+            if j % 3 == 0:
+                text = " ".join(rng.choice(WORDS, rng.integers(1, 12)))
+            else:
+                text = f"{rng.normal() * 10 ** rng.integers(0, 6):,.3f}"
+            cells.append(f"<td>{text}</td>")
+        rows.append(f"<tr><th>{i}</th>{''.join(cells)}</tr>")
+    return f"<table><thead><tr><th></th>{header}</tr></thead><tbody>{''.join(rows)}</tbody></table>"
+
+
+def time_layout(html, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        # a new TableMaker so that no text widths are cached
+        wrap_text.cache_clear()
+        tm = TableMaker(fontsize=22)
+        tm.fontsize = tm.original_fontsize
+        tm.rows, tm.num_header_rows = tm.parse_html(html)
+        start = time.perf_counter()
+        tm.calculate_col_widths()
+        best = min(best, time.perf_counter() - start)
+    return best, tm.fontsize
+
+
+def main():
+    num_rows = 50
+    print(f"{'columns':>8} {'layout (ms)':>12} {'fontsize':>9}")
+    for num_cols in (10, 25, 50, 100, 200):
+        seconds, fontsize = time_layout(make_html(num_rows, num_cols))
+        print(f"{num_cols:>8} {seconds * 1000:>12.1f} {fontsize:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
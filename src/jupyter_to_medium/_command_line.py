@@ -96,8 +96,14 @@ Optional Keyword Arguments
     As a workaround, images of the tables will be produced in their place.
     When 'chrome', a screenshot using the Chrome web browser will be used.
     When 'matplotlib', the matplotlib table function will be used to
-    produce the table.
-    Valid values are 'chrome' or 'matplotlib' (default: 'chrome')
+    produce the table. When 'pillow', the same table as 'matplotlib' is
+    drawn directly with Pillow, which is much faster. When 'text', no
+    images are made and tables are placed in code blocks as aligned text,
+    with long cells and extra columns truncated. Useful for quick drafts.
+    When 'auto', plain tables are drawn with Pillow and only tables with
+    Styler CSS, merged cells or html inside their cells are sent to Chrome.
+    Valid values are 'chrome', 'matplotlib', 'pillow', 'text' or 'auto'
+    (default: 'chrome')
 
 --gistify
     Medium has poor formatting for embedded code. To prevent chunks of code
@@ -115,6 +121,40 @@ Optional Keyword Arguments
     Whether to create the gists as public (can be found by search engines)
     or private (only accessible through link).
 
+--table-workers
+    Number of Chrome tabs used to screenshot tables in parallel when
+    --table-conversion is 'chrome'. Defaults to one per CPU core, capped
+    by the available memory. (default: None)
+
+--table-page-rows
+    Maximum number of rows in each image when --table-conversion is
+    'matplotlib' or 'pillow'. Longer tables are split into several images, each
+    repeating the header. (default: None)
+
+--upload-workers
+    Number of images uploaded to Medium at the same time. (default: 8)
+
+--link-remote-images
+    Leave images in markdown that are already online as links for Medium
+    to import instead of downloading and uploading them again. Either
+    'all', 'none' to download every image served over https, or a comma
+    separated list of hosts whose images are linked while the others are
+    downloaded, e.g. "cdn.example.com, i.imgur.com". (default: 'all')
+
+--optimize-images
+    Make the images smaller before they are saved and uploaded by
+    downscaling wide images and storing each as a PNG, a PNG with a palette
+    or a JPEG, whichever is smallest while looking the same.
+    True or False (default: True)
+
+--max-image-width
+    Width in pixels above which images are downscaled when
+    --optimize-images is True. (default: 1400)
+
+--max-gif-fps
+    Frame rate above which frames of animated GIFs are dropped when
+    --optimize-images is True. (default: None)
+
 Examples
 ========
 
@@ -155,12 +195,24 @@ parser.add_argument("--save-markdown", type=bool, default=False)
 parser.add_argument(
     "--table-conversion",
     type=str,
-    choices=["chrome", "matplotlib"],
+    choices=["chrome", "matplotlib", "pillow", "text", "auto"],
     default="chrome",
 )
 parser.add_argument("--gistify", type=bool, default=False)
 parser.add_argument("--gist-threshold", type=int, default=5)
 parser.add_argument("--public-gists", type=bool, default=False)
+parser.add_argument("--table-workers", type=int)
+parser.add_argument("--table-page-rows", type=int)
+parser.add_argument("--upload-workers", type=int, default=8)
+parser.add_argument("--link-remote-images", type=str, default="all")
+# bool("False") is True so a default of True needs the string checked
+parser.add_argument(
+    "--optimize-images",
+    type=lambda value: value.lower() not in ("false", "0", "no"),
+    default=True,
+)
+parser.add_argument("--max-image-width", type=int, default=1400)
+parser.add_argument("--max-gif-fps", type=float)
 
 
 def main():
@@ -170,6 +222,14 @@ def main():
         args = vars(parser.parse_args())
         if args["tags"]:
             args["tags"] = [tag.strip() for tag in args["tags"].split(",")[:5]]
+        if args["link_remote_images"] == "all":
+            args["link_remote_images"] = True
+        elif args["link_remote_images"] == "none":
+            args["link_remote_images"] = False
+        else:
+            args["link_remote_images"] = [
+                host.strip() for host in args["link_remote_images"].split(",")
+            ]
         del args["help"]
         from ._publish_to_medium import publish
 
@@ -0,0 +1,217 @@
+import argparse
+import base64
+import json
+import os
+import socket
+import socketserver
+import struct
+from pathlib import Path
+
+SOCKET_PATH = Path.home() / ".jupyter_to_medium" / "render.sock"
+
+
+def send_message(sock, message):
+    data = json.dumps(message).encode()
+    sock.sendall(struct.pack("!Q", len(data)) + data)
+
+
+def recv_exactly(sock, n):
+    chunks = []
+    while n > 0:
+        chunk = sock.recv(min(n, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Render daemon connection closed")
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock):
+    (n,) = struct.unpack("!Q", recv_exactly(sock, 8))
+    return json.loads(recv_exactly(sock, n))
+
+
+class RemoteTableConverter:
+    """Stands in for a table converter, sending the tables to the daemon"""
+
+    def __init__(self, client, options):
+        self.client = client
+        self.options = options
+
+    def run(self, html):
+        return self.run_batch([html])[0]
+
+    def run_batch(self, htmls):
+        return self.client.request(kind="tables", options=self.options, htmls=htmls)[
+            "results"
+        ]
+
+
+class DaemonClient:
+    def __init__(self, socket_path=SOCKET_PATH):
+        self.socket_path = str(socket_path)
+
+    def request(self, **message):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.socket_path)
+            send_message(sock, message)
+            response = recv_message(sock)
+        if "error" in response:
+            raise ValueError("Render daemon failed:\n" + response["error"])
+        return response
+
+    def table_converter(
+        self,
+        table_conversion,
+        chrome_path=None,
+        table_workers=None,
+        table_page_rows=None,
+    ):
+        options = {
+            "table_conversion": table_conversion,
+            "chrome_path": chrome_path,
+            "table_workers": table_workers,
+            "table_page_rows": table_page_rows,
+        }
+        return RemoteTableConverter(self, options)
+
+    def render_latex(self, formula):
+        result = self.request(kind="latex", formula=formula)["result"]
+        return base64.b64decode(result)
+
+
+def connect_daemon(socket_path=SOCKET_PATH):
+    """Returns a client for the render daemon or None when it isn't running"""
+    if not hasattr(socket, "AF_UNIX") or not Path(socket_path).exists():
+        return None
+    client = DaemonClient(socket_path)
+    try:
+        client.request(kind="ping")
+    except (OSError, ValueError):
+        return None
+    return client
+
+
+class RenderHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        message = recv_message(self.request)
+        try:
+            response = self.server.dispatch(message)
+        except Exception as e:
+            import traceback
+
+            response = {"error": f"{type(e).__name__}: {e}\n\n{traceback.format_exc()}"}
+        send_message(self.request, response)
+
+
+# unix sockets, and so socketserver.UnixStreamServer, are missing on
+# Windows, where the package still has to import
+if hasattr(socket, "AF_UNIX"):
+
+    class RenderServer(socketserver.UnixStreamServer):
+        """Keeps chrome, matplotlib and the LaTeX renderer loaded between
+        publishes. Requests are handled one at a time as the converters are
+        not thread safe."""
+
+        def __init__(self, socket_path=SOCKET_PATH):
+            self.converters = {}
+            socket_path = Path(socket_path)
+            socket_path.parent.mkdir(parents=True, exist_ok=True)
+            if socket_path.exists():
+                if connect_daemon(socket_path) is not None:
+                    raise OSError(
+                        f"A render daemon is already listening on {socket_path}"
+                    )
+                # left behind by a daemon that did not shut down cleanly
+                socket_path.unlink()
+            super().__init__(str(socket_path), RenderHandler)
+            os.chmod(socket_path, 0o600)
+            self.warm_up()
+
+        def warm_up(self):
+            from ._latex import draw_latex
+
+            # loads the matplotlib font cache and mathtext parser, skipping
+            # the render cache so that the drawing really happens
+            draw_latex("x^2")
+
+        def get_converter(self, options):
+            from ._publish_to_medium import create_table_converter
+
+            key = json.dumps(options, sort_keys=True)
+            if key not in self.converters:
+                self.converters[key] = create_table_converter(**options)
+            return self.converters[key]
+
+        def dispatch(self, message):
+            kind = message["kind"]
+            if kind == "ping":
+                return {}
+            elif kind == "tables":
+                converter = self.get_converter(message["options"])
+                if hasattr(converter, "run_batch"):
+                    results = converter.run_batch(message["htmls"])
+                else:
+                    results = [converter.run(html) for html in message["htmls"]]
+                return {"results": results}
+            elif kind == "latex":
+                from ._latex import render_latex
+
+                image = render_latex(message["formula"])
+                return {"result": base64.b64encode(image).decode()}
+            elif kind == "shutdown":
+                # shutdown blocks until serve_forever returns so it can't be
+                # called from the thread that is serving this request
+                import threading
+
+                threading.Thread(target=self.shutdown).start()
+                return {}
+            raise ValueError(f"Unknown request kind {kind}")
+
+        def server_close(self):
+            super().server_close()
+            for converter in self.converters.values():
+                close = getattr(converter, "close", None)
+                if close is not None:
+                    close()
+            try:
+                os.unlink(self.server_address)
+            except OSError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Keep chrome, matplotlib and the LaTeX renderer warm for jupyter_to_medium"
+    )
+    parser.add_argument(
+        "--socket", type=str, default=str(SOCKET_PATH), help="path of the unix socket"
+    )
+    parser.add_argument("--stop", action="store_true", help="stop a running daemon")
+    args = parser.parse_args()
+
+    if not hasattr(socket, "AF_UNIX"):
+        parser.exit(
+            1,
+            "The render daemon needs unix sockets, which this platform does not have\n",
+        )
+
+    if args.stop:
+        client = connect_daemon(args.socket)
+        if client is None:
+            print("No render daemon is running")
+        else:
+            client.request(kind="shutdown")
+            print("Render daemon stopped")
+        return
+
+    with RenderServer(args.socket) as server:
+        print(f"jupyter_to_medium render daemon listening on {args.socket}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
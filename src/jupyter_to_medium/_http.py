@@ -0,0 +1,189 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def get_retry_after(response):
+    """Returns the seconds to wait from the Retry-After header or None"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class HttpClient:
+    """
+    Makes every request of jupyter_to_medium so that they all share the
+    same connection pools, timeouts and retries.
+
+    Each host gets its own session with a pool of kept alive connections
+    and a limit on the number of requests made to it at the same time.
+    Requests that fail to connect, time out or get a 429 or 5xx status are
+    retried with jittered exponential backoff, waiting at least as long as
+    the Retry-After header asks. Requests that are not idempotent, such as
+    creating a post, are only retried when the server can't have acted on
+    them: when the connection failed or the status is 429.
+
+    The number of requests, retries and failures and the total time spent
+    are counted per host.
+
+    Parameters
+    ----------
+    timeout : tuple of float, default (5, 30)
+        Connect and read timeouts in seconds, used when a request does not
+        give its own
+
+    retries : int, default 4
+        Number of times a request is retried before giving up
+
+    backoff : float, default 0.5
+        Seconds waited before the first retry, doubled for every other
+
+    max_backoff : float, default 30
+        Longest wait between two attempts in seconds
+
+    max_per_host : int, default 8
+        Number of requests made to the same host at the same time
+    """
+
+    def __init__(
+        self, timeout=(5, 30), retries=4, backoff=0.5, max_backoff=30, max_per_host=8
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_per_host = max_per_host
+        self.sessions = {}
+        self.limits = {}
+        self.stats = defaultdict(
+            lambda: {"requests": 0, "retries": 0, "failures": 0, "seconds": 0.0}
+        )
+        self.lock = threading.Lock()
+
+    def set_limit(self, host, max_per_host):
+        """Changes the number of requests made to one host at the same time"""
+        with self.lock:
+            self.add_session(host, max_per_host)
+
+    def add_session(self, host, max_per_host):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_per_host)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        old_session = self.sessions.get(host)
+        self.sessions[host] = session
+        self.limits[host] = threading.BoundedSemaphore(max_per_host)
+        if old_session is not None:
+            old_session.close()
+
+    def get_session(self, host):
+        with self.lock:
+            if host not in self.sessions:
+                self.add_session(host, self.max_per_host)
+            return self.sessions[host], self.limits[host]
+
+    def get_wait(self, attempt, response=None):
+        wait = min(self.backoff * 2 ** attempt, self.max_backoff) * random.uniform(
+            0.5, 1
+        )
+        retry_after = get_retry_after(response) if response is not None else None
+        if retry_after is not None:
+            wait = max(wait, min(retry_after, self.max_backoff))
+        return wait
+
+    def request(self, method, url, idempotent=True, **kwargs):
+        """
+        Sends a request and returns the response, retrying it when it
+        fails for a reason that may go away. The response of the last
+        attempt is returned even when its status is an error and the
+        exception of the last attempt is raised when none got a response.
+
+        Parameters
+        ----------
+        method : str
+            'GET', 'POST', ...
+
+        url : str
+
+        idempotent : bool, default True
+            Whether the request can safely be sent again when the server
+            may have already acted on it
+
+        kwargs
+            Passed to `requests.Session.request`
+        """
+        host = urlsplit(url).netloc
+        session, limit = self.get_session(host)
+        kwargs.setdefault("timeout", self.timeout)
+        stats = self.stats[host]
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            response = None
+            start = time.perf_counter()
+            try:
+                with limit:
+                    response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # a read timeout means the server may have the request
+                retry = not last and (
+                    idempotent or isinstance(e, requests.ConnectTimeout)
+                )
+                with self.lock:
+                    stats["requests"] += 1
+                    stats["seconds"] += time.perf_counter() - start
+                    stats["retries" if retry else "failures"] += 1
+                if not retry:
+                    raise
+            else:
+                status = response.status_code
+                retry = (
+                    not last
+                    and status in RETRY_STATUSES
+                    and (idempotent or status == 429)
+                )
+                with self.lock:
+                    stats["requests"] += 1
+                    stats["seconds"] += time.perf_counter() - start
+                    if retry:
+                        stats["retries"] += 1
+                    elif status >= 400:
+                        stats["failures"] += 1
+                if not retry:
+                    return response
+            wait = self.get_wait(attempt, response)
+            print(f"retrying {method} {url} in {wait:.1f}s")
+            time.sleep(wait)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def print_stats(self):
+        for host, stats in self.stats.items():
+            average = stats["seconds"] / max(stats["requests"], 1) * 1000
+            print(
+                f"{host:20}{stats['requests']} requests, {stats['retries']} retries, "
+                f"{stats['failures']} failures, {average:.0f} ms on average"
+            )
+
+
+# shared by every request made while publishing
+HTTP_CLIENT = HttpClient()
@@ -1,5 +1,35 @@
 from io import BytesIO as StringIO
+import threading
+
+import matplotlib
 import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.backends.backend_agg import RendererAgg
+from matplotlib.font_manager import FontProperties, findfont, get_font
+from PIL import Image
+
+from ._render_cache import CACHE_DIR, RenderCache
+
+# formulas rendered before, shared by every publish on this machine
+LATEX_CACHE = RenderCache(CACHE_DIR / "latex")
+
+# the mathtext parser and the fonts are shared by every caller and are
+# not thread safe
+MATHTEXT_LOCK = threading.Lock()
+# matplotlib's default line spacing as a multiple of the line height
+LINESPACING = 1.2
+# matplotlib 3.11 spaces the lines of a text by the ascent and descent of
+# the font instead of the height of "lp"
+FONT_METRICS_LAYOUT = matplotlib.__version_info__ >= (3, 11)
+# changed whenever rasterize_latex draws differently so that images cached
+# by an older version aren't reused
+RENDER_VERSION = 2
+# leaves out the version and dates so the same formula gives the same bytes
+NO_METADATA = {
+    "png": {"Software": None},
+    "svg": {"Date": None},
+    "pdf": {"CreationDate": None},
+}
 
 
 def is_latex_cell(cell):
@@ -30,7 +60,123 @@ def is_latex_cell(cell):
 
 
 def render_latex(formula, fontsize=10, dpi=200, format_="png"):
-    """Renders LaTeX formula into image."""
+    """Renders LaTeX formula into image, reusing the image from the cache
+    when the same formula was rendered before with the same settings."""
+    key = LATEX_CACHE.make_key(
+        "mathtext",
+        RENDER_VERSION,
+        formula,
+        fontsize,
+        dpi,
+        format_,
+        matplotlib.__version__,
+    )
+    return LATEX_CACHE.get_or_render(
+        key, lambda: draw_latex(formula, fontsize, dpi, format_)
+    )
+
+
+def draw_latex(formula, fontsize=10, dpi=200, format_="png"):
+    """Renders LaTeX formula into image. PNGs are rasterized directly by
+    `rasterize_latex`, other formats are saved from a figure."""
+    if format_ == "png":
+        return rasterize_latex(formula, fontsize, dpi)
+    return draw_latex_figure(formula, fontsize, dpi, format_)
+
+
+def get_font_height_metrics(font, fontsize, dpi):
+    """Returns the ascent, descent and line gap of a TrueType font in pixels,
+    read from the same tables as matplotlib"""
+    scale = fontsize * dpi / 72 / font.get_sfnt_table("head")["unitsPerEm"]
+    for table_name, gap_key, ascent_key, descent_key in [
+        ("OS/2", "sTypoLineGap", "sTypoAscender", "sTypoDescender"),
+        ("hhea", "lineGap", "ascent", "descent"),
+    ]:
+        table = font.get_sfnt_table(table_name)
+        if table is not None:
+            return (
+                table[ascent_key] * scale,
+                -table[descent_key] * scale,
+                table[gap_key] * scale,
+            )
+
+
+def rasterize_latex(formula, fontsize=10, dpi=200):
+    """
+    Renders LaTeX formula into a PNG without creating a figure
+
+    The lines are measured and spaced the way matplotlib lays out the lines
+    of a text, then drawn by the Agg renderer onto a canvas as big as the
+    tight bounding box `draw_latex_figure` would save. The result looks the
+    same, to within a pixel or two before matplotlib 3.11, but the text
+    is only drawn once and neither pyplot nor the rcParams are used, so it
+    can be called from several threads.
+    """
+    # same fonts as the style used by draw_latex_figure, which falls back
+    # to the default font when Palatino isn't installed
+    prop = FontProperties(
+        family="Palatino", weight="light", size=fontsize, math_fontfamily="dejavuserif"
+    )
+    lines = f"${formula}$".split("\n")
+    with MATHTEXT_LOCK:
+        renderer = RendererAgg(1, 1, dpi)
+        metrics = [
+            renderer.get_text_width_height_descent(line, prop, ismath=True)
+            for line in lines
+        ]
+
+        # baseline of every line, measured down from the top of the first one
+        baselines = []
+        y = 0
+        if FONT_METRICS_LAYOUT:
+            # every line is at least as tall as the font, with the line gap
+            # split above and below it
+            font = get_font(findfont(prop))
+            min_ascent, min_descent, line_gap = get_font_height_metrics(
+                font, fontsize, dpi
+            )
+            line_gap = line_gap if len(lines) > 1 else 0
+            for _, h, d in metrics:
+                y += max(h - d, min_ascent) + line_gap / 2
+                baselines.append(y)
+                y += max(d, min_descent) + line_gap / 2
+        else:
+            # matplotlib measures the minimum line height on plain text
+            _, lp_h, lp_d = renderer.get_text_width_height_descent(
+                "lp", prop, ismath=False
+            )
+            min_dy = (lp_h - lp_d) * LINESPACING
+            for i, (_, h, d) in enumerate(metrics):
+                h = max(h, lp_h)
+                d = max(d, lp_d)
+                if i == 0:
+                    y = h - d
+                else:
+                    y += max(min_dy, (h - d) * LINESPACING)
+                baselines.append(y)
+                y += d
+
+        # savefig truncates the size of the bounding box, cutting from the
+        # top as the text is drawn from the bottom
+        width = max(int(max(w for w, _, _ in metrics)), 1)
+        height = max(int(y), 1)
+        renderer = RendererAgg(width, height, dpi)
+        gc = renderer.new_gc()
+        for baseline, line in zip(baselines, lines):
+            renderer.draw_mathtext(gc, 0, baseline + height - y, line, prop, 0)
+        gc.restore()
+        alpha = np.asarray(renderer.buffer_rgba())[..., 3]
+
+    # black text on a transparent background like savefig(transparent=True)
+    rgba = np.zeros(alpha.shape + (4,), dtype=np.uint8)
+    rgba[..., 3] = alpha
+    buffer_ = StringIO()
+    Image.fromarray(rgba).save(buffer_, format="png", dpi=(dpi, dpi))
+    return buffer_.getvalue()
+
+
+def draw_latex_figure(formula, fontsize=10, dpi=200, format_="png"):
+    """Renders LaTeX formula into image by saving a matplotlib figure."""
     # set formatting
     mpl_context = {
         "text.usetex": False,
@@ -53,6 +199,7 @@ def render_latex(formula, fontsize=10, dpi=200, format_="png"):
         format=format_,
         bbox_inches="tight",
         pad_inches=0.0,
+        metadata=NO_METADATA.get(format_),
     )
     plt.close(fig)
     # return the bytes value of the fig - this is our photo'ed latex
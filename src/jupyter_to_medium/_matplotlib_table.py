@@ -1,13 +1,21 @@
 import io
 import base64
 import textwrap
+from functools import lru_cache
 
-from bs4 import BeautifulSoup
 import numpy as np
 from matplotlib.figure import Figure
 from matplotlib import patches as mpatches, lines as mlines
 from matplotlib.transforms import Bbox
-from matplotlib.backends.backend_agg import RendererAgg
+
+from ._table_parser import parse_table, parse_table_schema
+from ._text_metrics import TextMetrics
+
+
+@lru_cache(maxsize=100_000)
+def wrap_text(text, width):
+    # the same cells are wrapped again for each font size tried
+    return textwrap.fill(text, width, break_long_words=False)
 
 
 class TableMaker:
@@ -17,11 +25,15 @@ class TableMaker:
         encode_base64=True,
         limit_crop=True,
         for_document=True,
+        max_page_rows=None,
+        max_page_height=16_000,
     ):
         self.original_fontsize = fontsize
         self.encode_base64 = encode_base64
         self.limit_crop = limit_crop
         self.for_document = for_document
+        self.max_page_rows = max_page_rows
+        self.max_page_height = max_page_height
         self.figwidth = 0.1
         self.figheight = 0.1
         self.wrap_length = 30
@@ -30,10 +42,16 @@ class TableMaker:
             self.figheight = 4
             self.wrap_length = 10
         self.dpi = 100
+        self.min_fontsize = 12
+        self.text_metrics = TextMetrics(dpi=self.dpi)
 
     def parse_html(self, html):
         html = html.replace("<br>", "\n")
         rows, num_header_rows = self.parse_into_rows(html)
+        return self.expand_spans(rows), num_header_rows
+
+    def expand_spans(self, rows):
+        """Repeats cells spanning several rows or columns in each of them"""
         num_cols = sum(val[-1] for val in rows[0])
         new_rows = []
         rowspan = {}
@@ -61,118 +79,127 @@ class TableMaker:
                         new_row.append(val[:3])
                     j += 1
             new_rows.append(new_row)
-        return new_rows, num_header_rows
-
-    def get_text_align(self, element):
-        style = element.get("style", "").lower()
-        if "text-align" in style:
-            idx = style.find("text-align")
-            idx_off = idx + 10
-            text_align = style[idx_off:].split(":")[1].strip()
-            for val in ("left", "right", "center"):
-                if text_align.startswith(val):
-                    return val
+        return new_rows
 
     def parse_into_rows(self, html):
-        def parse_row(row):
-            values = []
-            row_align = self.get_text_align(row)
-            for el in row.find_all(["td", "th"]):
-                bold = el.name == "th"
-                colspan = int(el.attrs.get("colspan", 1))
-                rowspan = int(el.attrs.get("rowspan", 1))
-                text_align = self.get_text_align(el) or row_align
-                text = el.get_text()
-                values.append([text, bold, text_align, rowspan, colspan])
-            return values
-
-        soup = BeautifulSoup(html, features="lxml")
-        thead = soup.find("thead")
-        tbody = soup.find("tbody")
-
-        rows = []
-        if thead:
-            head_rows = thead.find_all("tr")
-            if head_rows:
-                for row in head_rows:
-                    rows.append(parse_row(row))
-            else:
-                rows.append(parse_row(thead))
-
-        num_header_rows = len(rows)
-
-        if tbody:
-            for row in tbody.find_all("tr"):
-                rows.append(parse_row(row))
-
-        if not thead and not tbody:
-            for row in soup.find_all("tr"):
-                rows.append(parse_row(row))
-        return rows, num_header_rows
-
-    def get_text_width(self, text):
-        fig = self.text_fig
-        t = fig.text(0, 0, text, size=self.fontsize)
-        bbox = t.get_window_extent(renderer=self.renderer)
-        return bbox.width
-
-    def get_all_text_widths(self, rows):
-        all_text_widths = []
-        for row in rows:
-            row_widths = []
-            for vals in row:
-                cell_max_width = 0
-                for text in vals[0].split("\n"):
-                    cell_max_width = max(cell_max_width, self.get_text_width(text))
-                row_widths.append(cell_max_width)
-            all_text_widths.append(row_widths)
-        return np.array(all_text_widths) + 15
+        return parse_table(html)
 
-    def calculate_col_widths(self):
-        all_text_widths = self.get_all_text_widths(self.rows)
+    def get_text_widths(self, texts, bolds, fontsize):
+        # measure the normal and bold cells in one call each
+        widths = np.empty(len(texts))
+        bolds = np.asarray(bolds, dtype=bool)
+        for bold in (False, True):
+            locs = np.flatnonzero(bolds == bold)
+            if len(locs):
+                weight = "bold" if bold else "normal"
+                cell_texts = [texts[i] for i in locs]
+                widths[locs] = self.text_metrics.widths(cell_texts, fontsize, weight)
+        return widths + 15
+
+    def get_all_text_widths(self, cols, bolds, fontsize):
+        texts = [text for col in cols for text in col]
+        widths = self.get_text_widths(texts, bolds.T.ravel(), fontsize)
+        return widths.reshape(len(cols), -1).T
+
+    def get_cols(self):
+        cols = [[row[j][0] for row in self.rows] for j in range(len(self.rows[0]))]
+        bolds = np.array([[val[1] for val in row] for row in self.rows], dtype=bool)
+        return cols, bolds
+
+    def fit_columns(self, fontsize):
+        """
+        Wraps the widest columns until the table fits the figure width
+
+        Only the column just wrapped is measured again. Returns the text of
+        each column, the maximum width of each column and whether the
+        table fits.
+
+        Parameters
+        ----------
+        fontsize : float
+        """
+        cols, bolds = self.get_cols()
+        all_text_widths = self.get_all_text_widths(cols, bolds, fontsize)
         max_col_widths = all_text_widths.max(axis=0)
+        total_width = self.figwidth * self.dpi
+        # smaller font sizes may fit without wrapping anything
+        if max_col_widths.sum() < total_width:
+            return cols, max_col_widths, True
+
         mult = 1
+        while mult > 0.5:
+            mult *= 0.9
+            for idx in np.argsort(-max_col_widths):
+                col_widths = all_text_widths[:, idx]
+                new_col = self.wrap_col(cols[idx], col_widths, mult, fontsize)
+                if new_col is not None:
+                    cols[idx] = new_col
+                    col_widths = self.get_text_widths(new_col, bolds[:, idx], fontsize)
+                    all_text_widths[:, idx] = col_widths
+                    max_col_widths[idx] = col_widths.max()
+                    if max_col_widths.sum() < total_width:
+                        return cols, max_col_widths, True
+        return cols, max_col_widths, False
+
+    def calculate_col_widths(self):
+        """
+        Returns the proportion of the figure width taken by each column.
+        When the table is too wide, the columns are wrapped at the largest
+        font size between `min_fontsize` and the original size at which the
+        table fits. That font size is found with a binary search.
+        """
+        cols, bolds = self.get_cols()
+        max_col_widths = self.get_all_text_widths(cols, bolds, self.fontsize).max(
+            axis=0
+        )
         total_width = self.figwidth * self.dpi
-        if self.for_document and sum(max_col_widths) >= total_width:
-            while mult > 0.5:
-                mult *= 0.9
-                for idx in np.argsort(-max_col_widths):
-                    col_widths = all_text_widths[:, idx]
-                    rows = self.wrap_col(idx, col_widths, mult)
-                    all_text_widths = self.get_all_text_widths(rows)
-                    max_col_widths = all_text_widths.max(axis=0)
-                    if sum(max_col_widths) < total_width:
-                        break
-
-            if mult <= 0.5 and self.fontsize > 12:
-                self.fontsize *= 0.9
-                return self.calculate_col_widths()
-            else:
-                self.rows = rows
-                total_width = sum(max_col_widths)
+        if not self.for_document or max_col_widths.sum() < total_width:
+            return [width / total_width for width in max_col_widths]
+
+        fontsize = self.fontsize
+        cols, max_col_widths, fits = self.fit_columns(fontsize)
+        if not fits and fontsize > self.min_fontsize:
+            lo, hi = self.min_fontsize, fontsize
+            fontsize = lo
+            cols, max_col_widths, fits = self.fit_columns(lo)
+            while fits and hi - lo > 0.5:
+                mid = (lo + hi) / 2
+                mid_cols, mid_max_col_widths, mid_fits = self.fit_columns(mid)
+                if mid_fits:
+                    lo = fontsize = mid
+                    cols, max_col_widths = mid_cols, mid_max_col_widths
+                else:
+                    hi = mid
+        self.fontsize = fontsize
+
+        for j, col in enumerate(cols):
+            for row, text in zip(self.rows, col):
+                row[j][0] = text
 
+        total_width = max_col_widths.sum()
         col_prop = [width / total_width for width in max_col_widths]
         return col_prop
 
-    def wrap_col(self, idx, col_widths, mult):
-        rows = self.rows.copy()
+    def wrap_col(self, texts, col_widths, mult, fontsize):
+        """Returns the wrapped column text or None when wrapping would
+        not make the column narrower"""
         max_width = max(col_widths)
-        texts = [row[idx][0] for row in self.rows]
         new_texts = []
-        new_max_width = 0
-        for _, (text, col_width) in enumerate(zip(texts, col_widths)):
+        wrapped_texts = []
+        for text, col_width in zip(texts, col_widths):
             if col_width > mult * max_width and len(text) > self.wrap_length:
                 width = max(self.wrap_length, int(len(text) * mult))
-                new_text = textwrap.fill(text, width, break_long_words=False)
+                new_text = wrap_text(text, width)
                 new_texts.append(new_text)
-                new_max_width = max(new_max_width, self.get_text_width(new_text))
+                wrapped_texts.append(new_text)
             else:
                 new_texts.append(text)
 
+        if not wrapped_texts:
+            return None
+        new_max_width = self.text_metrics.widths(wrapped_texts, fontsize).max()
         if new_max_width < max_width:
-            for row, text in zip(rows, new_texts):
-                row[idx][0] = text
-        return rows
+            return new_texts
 
     def get_row_heights(self):
         row_heights = []
@@ -183,23 +210,53 @@ class TableMaker:
 
         return row_heights
 
-    def create_figure(self):
-        figheight = sum(self.row_heights)
+    def get_pages(self):
+        """
+        Splits the rows into pages of at most `max_page_rows` body rows and
+        `max_page_height` pixels. The header rows start every page.
+
+        Returns a list of the row indices of each page.
+        """
+        header = list(range(self.num_header_rows))
+        header_height = sum(self.row_heights[: self.num_header_rows]) * self.dpi
+        max_rows = self.max_page_rows or len(self.rows)
+        max_height = self.max_page_height or float("inf")
+        pages = []
+        page = []
+        height = header_height
+        for i in range(self.num_header_rows, len(self.rows)):
+            row_height = self.row_heights[i] * self.dpi
+            if page and (len(page) >= max_rows or height + row_height > max_height):
+                pages.append(header + page)
+                page = []
+                height = header_height
+            page.append(i)
+            height += row_height
+        if page or not pages:
+            pages.append(header + page)
+        return pages
+
+    def create_figure(self, row_heights):
+        figheight = sum(row_heights)
         fig = Figure(dpi=self.dpi, figsize=(self.figwidth, figheight))
         return fig
 
-    def print_table(self):
+    def print_table(self, row_idx):
+        rows = [self.rows[i] for i in row_idx]
+        row_heights = [self.row_heights[i] for i in row_idx]
+        self.fig = self.create_figure(row_heights)
         total_width = sum(self.col_widths)
         figheight = self.fig.get_figheight()
-        row_locs = [height / figheight for height in self.row_heights]
+        row_locs = [height / figheight for height in row_heights]
 
         header_text_align = [vals[2] for vals in self.rows[0]]
         x0 = (1 - total_width) / 2
         x = x0
+        pad = 15 / (self.figwidth * self.dpi)
         yd = row_locs[0]
         y = 1
 
-        for i, (yd, row) in enumerate(zip(row_locs, self.rows)):
+        for i, yd, row in zip(row_idx, row_locs, rows):
             x = x0
             y -= yd
             for j, (xd, val) in enumerate(zip(self.col_widths, row)):
@@ -211,8 +268,10 @@ class TableMaker:
                     x += xd
                 elif ha == "center":
                     x += xd / 2
+                # the padding measured with each cell goes on its left so
+                # left aligned text doesn't touch a right aligned neighbour
                 self.fig.text(
-                    x,
+                    x + pad if ha == "left" else x,
                     y + yd / 2,
                     text,
                     family="Helvetica",
@@ -247,18 +306,34 @@ class TableMaker:
         end = self.figwidth - start
         bbox = Bbox([[start - 0.1, y * h], [end + 0.1, h]])
         buffer = io.BytesIO()
-        self.fig.savefig(buffer, bbox_inches=bbox)
+        # without the matplotlib version the same table always gives the
+        # same bytes
+        self.fig.savefig(buffer, bbox_inches=bbox, metadata={"Software": None})
         img_str = buffer.getvalue()
         if self.encode_base64:
             img_str = base64.b64encode(img_str).decode()
         return img_str
 
-    def run(self, html):
+    def render(self, rows, num_header_rows):
+        """
+        Returns the image of the table, or a list of images when the table
+        is split into pages. Pages are drawn one at a time so that only one
+        figure is held in memory.
+        """
         self.fontsize = self.original_fontsize
-        self.text_fig = Figure(dpi=self.dpi)
-        self.renderer = RendererAgg(self.figwidth, self.figheight, self.dpi)
-        self.rows, self.num_header_rows = self.parse_html(html)
+        self.rows, self.num_header_rows = rows, num_header_rows
         self.col_widths = self.calculate_col_widths()
         self.row_heights = self.get_row_heights()
-        self.fig = self.create_figure()
-        return self.print_table()
+        img_strs = [self.print_table(row_idx) for row_idx in self.get_pages()]
+        self.fig = None
+        if len(img_strs) == 1:
+            return img_strs[0]
+        return img_strs
+
+    def run(self, html):
+        return self.render(*self.parse_html(html))
+
+    def run_table_schema(self, payload):
+        """Renders a DataFrame from its JSON table schema output data"""
+        rows, num_header_rows = parse_table_schema(payload)
+        return self.render(self.expand_spans(rows), num_header_rows)
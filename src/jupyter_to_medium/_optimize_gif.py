@@ -0,0 +1,199 @@
+import io
+
+import numpy as np
+from PIL import GifImagePlugin, Image, ImageSequence
+
+# palette index left for the pixels that did not change since the last frame
+TRANSPARENT = 255
+# most pixels sampled from the frames to build the shared palette
+PALETTE_SAMPLE_PIXELS = 1_000_000
+
+
+def read_frames(image, max_width=None):
+    """Yields each fully drawn frame as an RGBA array along with the time in
+    milliseconds it is shown, decoding one frame at a time"""
+    for frame in ImageSequence.Iterator(image):
+        rgba = frame.convert("RGBA")
+        if max_width and rgba.width > max_width:
+            height = max(round(rgba.height * max_width / rgba.width), 1)
+            rgba = rgba.resize((max_width, height), Image.LANCZOS)
+        duration = frame.info.get("duration", image.info.get("duration", 100))
+        yield np.asarray(rgba), duration
+
+
+def drop_frames(frames, max_fps=None):
+    """Merges each frame that is the same as the one before, or shown less
+    than 1 / `max_fps` seconds after the last kept frame, into that frame.
+    Yields the kept frames once their duration is known."""
+    min_interval = 1000 / max_fps if max_fps else 0
+    kept = None
+    kept_duration = 0
+    for frame, duration in frames:
+        if kept is not None and (
+            kept_duration < min_interval or np.array_equal(frame, kept)
+        ):
+            kept_duration += duration
+            continue
+        if kept is not None:
+            yield kept, kept_duration
+        kept, kept_duration = frame, duration
+    if kept is not None:
+        yield kept, kept_duration
+
+
+def get_palette(image, max_width=None):
+    """
+    Returns an image holding one palette of 255 colors for every frame,
+    leaving the last index for transparency, or None when a frame has
+    transparent pixels.
+
+    The frames are read once. When they have no more than 255 colors
+    between them, the palette holds exactly those colors. Otherwise a
+    sample of at most `PALETTE_SAMPLE_PIXELS` pixels is quantized.
+    """
+    n_frames = getattr(image, "n_frames", 1)
+    colors = np.zeros(0, dtype=np.uint32)
+    samples = []
+    step = None
+    for frame, _ in read_frames(image, max_width):
+        if frame[..., 3].min() < 255:
+            return None
+        if step is None:
+            step = max(
+                int(np.sqrt(n_frames * frame[..., 0].size / PALETTE_SAMPLE_PIXELS)), 1
+            )
+        samples.append(frame[::step, ::step, :3].reshape(-1, 3))
+        if colors is not None:
+            rgb = frame[..., :3].astype(np.uint32)
+            packed = (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+            colors = np.union1d(colors, np.unique(packed))
+            if len(colors) > TRANSPARENT:
+                colors = None
+
+    if colors is not None:
+        palette = [
+            int(value)
+            for color in colors.tolist()
+            for value in (color >> 16, (color >> 8) & 255, color & 255)
+        ]
+    else:
+        sample = np.concatenate(samples)
+        side = int(np.ceil(np.sqrt(len(sample))))
+        sample = np.concatenate(
+            [sample, np.repeat(sample[-1:], side * side - len(sample), axis=0)]
+        )
+        quantized = Image.fromarray(sample.reshape(side, side, 3)).quantize(
+            TRANSPARENT, method=Image.Quantize.MEDIANCUT
+        )
+        palette = quantized.getpalette()[: TRANSPARENT * 3]
+    # padded with the first color so that a pixel mapped to the
+    # transparent index can be moved to index 0 without changing
+    palette += palette[:3] * (256 - len(palette) // 3)
+    palette_image = Image.new("P", (1, 1))
+    palette_image.putpalette(palette)
+    return palette_image
+
+
+def get_changed_box(indices, previous):
+    """Returns the box (left, top, right, bottom) around the pixels that
+    changed since the previous frame, or None when none did"""
+    changed = indices != previous
+    rows = np.flatnonzero(changed.any(axis=1))
+    if not len(rows):
+        return None
+    cols = np.flatnonzero(changed.any(axis=0))
+    return cols[0], rows[0], cols[-1] + 1, rows[-1] + 1
+
+
+def write_frame(buffer, indices, box, duration, palette):
+    """Encodes the palette indices of one frame, drawn at the top left
+    corner of the box on top of the frame before"""
+    # an L image becomes a P image once it is given a palette
+    frame_image = Image.fromarray(indices)
+    frame_image.putpalette(palette)
+    chunks = GifImagePlugin.getdata(
+        frame_image,
+        offset=box[:2],
+        duration=duration,
+        disposal=1,
+        transparency=TRANSPARENT,
+    )
+    buffer.write(b"".join(chunks))
+
+
+def optimize_gif(data, max_width=None, max_fps=None):
+    """
+    Returns a smaller version of an animated GIF or None when it can't be
+    made smaller.
+
+    Frames identical to the one before are merged and every frame is
+    mapped to one palette shared by the whole animation. Each frame is
+    cropped to the region that changed since the last one, where the
+    pixels that did not change are made transparent. GIFs with transparent
+    pixels of their own are left alone.
+
+    The frames are decoded twice, once to build the palette and once to
+    encode them, and only the last two are kept in memory, so large GIFs
+    don't need memory for all of their frames.
+
+    Parameters
+    ----------
+    data : bytes
+
+    max_width : int, default None
+        Width in pixels above which the frames are downscaled
+
+    max_fps : float, default None
+        Frames shown sooner than 1 / `max_fps` seconds after the last one
+        are dropped
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        if getattr(image, "n_frames", 1) < 2:
+            return None
+        loop = image.info.get("loop")
+        palette_image = get_palette(image, max_width)
+        if palette_image is None:
+            return None
+        palette = palette_image.getpalette()
+
+        buffer = io.BytesIO()
+        previous = None
+        pending = None
+        for frame, duration in drop_frames(read_frames(image, max_width), max_fps):
+            quantized = Image.fromarray(frame[..., :3]).quantize(
+                palette=palette_image, dither=Image.Dither.NONE
+            )
+            indices = np.asarray(quantized)
+            indices = np.where(indices == TRANSPARENT, 0, indices).astype(np.uint8)
+            if previous is None:
+                canvas = Image.new("P", (indices.shape[1], indices.shape[0]))
+                canvas.putpalette(palette)
+                info = {"transparency": TRANSPARENT, "optimize": False}
+                if loop is not None:
+                    info["loop"] = loop
+                header, _ = GifImagePlugin.getheader(canvas, info=info)
+                buffer.write(b"".join(header))
+                box = (0, 0, indices.shape[1], indices.shape[0])
+                out = indices
+            else:
+                box = get_changed_box(indices, previous)
+                if box is None:
+                    pending[2] += duration
+                    continue
+                left, top, right, bottom = box
+                out = indices[top:bottom, left:right].copy()
+                out[out == previous[top:bottom, left:right]] = TRANSPARENT
+            if pending is not None:
+                write_frame(buffer, *pending, palette)
+                if buffer.tell() >= len(data):
+                    return None
+            pending = [out, box, duration]
+            previous = indices
+    except OSError:
+        return None
+
+    write_frame(buffer, *pending, palette)
+    buffer.write(b";")
+    new_data = buffer.getvalue()
+    return new_data if len(new_data) < len(data) else None
@@ -0,0 +1,169 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from ._optimize_gif import optimize_gif
+
+# lossy candidates are only used when they are at least this close to the
+# image they replace, in dB of peak signal to noise ratio
+MIN_PSNR = 35
+JPEG_QUALITY = 85
+OPTIMIZED_TYPES = {".png", ".jpeg", ".jpg", ".gif"}
+
+
+def get_psnr(image, other):
+    a = np.asarray(image.convert("RGBA"), dtype=np.float64)
+    b = np.asarray(other.convert("RGBA"), dtype=np.float64)
+    mse = np.mean((a - b) ** 2)
+    return np.inf if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+
+def encode(image, format_, **kwargs):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format_, **kwargs)
+    return buffer.getvalue()
+
+
+def optimize_image(data, max_width=1400):
+    """
+    Returns the smallest encoding of an image that still looks the same
+    as a tuple of the bytes and the extension, or None when none is
+    smaller than the original.
+
+    Images wider than `max_width` are downscaled first. The candidates are
+    a recompressed PNG, a PNG with a palette of at most 256 colors, which
+    suits flat table images, and a JPEG for opaque images. The lossy ones
+    are only kept when their PSNR is at least `MIN_PSNR`. Photos are
+    turned upright from their EXIF orientation, as the tag is not copied,
+    and the ICC profile is kept so that the colors don't shift.
+
+    Parameters
+    ----------
+    data : bytes
+        The PNG or JPEG image
+
+    max_width : int, default 1400
+        Width in pixels above which images are downscaled
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except OSError:
+        return None
+    # the ICC profile of a CMYK image can't be kept once it is RGB
+    if getattr(image, "n_frames", 1) > 1 or image.mode == "CMYK":
+        return None
+    icc_profile = image.info.get("icc_profile")
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode not in ("L", "LA", "RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+    if image.width > max_width:
+        height = max(round(image.height * max_width / image.width), 1)
+        image = image.resize((max_width, height), Image.LANCZOS)
+    has_alpha = image.mode in ("LA", "RGBA") and image.getextrema()[-1][0] < 255
+    if not has_alpha and image.mode in ("LA", "RGBA"):
+        image = image.convert(image.mode[:-1])
+
+    candidates = [(encode(image, "png", optimize=True, icc_profile=icc_profile), "png")]
+    if image.mode != "L":
+        method = Image.Quantize.FASTOCTREE if has_alpha else Image.Quantize.MEDIANCUT
+        quantized = image.quantize(256, method=method)
+        if get_psnr(image, quantized) >= MIN_PSNR:
+            candidates.append(
+                (
+                    encode(quantized, "png", optimize=True, icc_profile=icc_profile),
+                    "png",
+                )
+            )
+    if not has_alpha:
+        jpeg = encode(
+            image, "jpeg", quality=JPEG_QUALITY, optimize=True, icc_profile=icc_profile
+        )
+        if get_psnr(image, Image.open(io.BytesIO(jpeg))) >= MIN_PSNR:
+            candidates.append((jpeg, "jpeg"))
+
+    # a downscaled image can still be bigger, such as a grayscale table
+    # that gains many shades of gray from the resampling
+    best = min(candidates, key=lambda candidate: len(candidate[0]))
+    if len(best[0]) >= len(data):
+        return None
+    return best
+
+
+def optimize_any_image(name, data, max_width=1400, max_gif_fps=None):
+    if Path(name).suffix.lower() == ".gif":
+        new_data = optimize_gif(data, max_width, max_gif_fps)
+        return None if new_data is None else (new_data, "gif")
+    return optimize_image(data, max_width)
+
+
+def optimize_images(image_data_dict, max_width=1400, max_gif_fps=None, workers=None):
+    """
+    Optimizes every PNG, JPEG and animated GIF in the dict and prints how
+    many bytes were saved for each of them
+
+    Parameters
+    ----------
+    image_data_dict : dict
+        Maps the names of the images used in the markdown to their bytes
+
+    max_width : int, default 1400
+        Width in pixels above which images are downscaled
+
+    max_gif_fps : float, default None
+        Frame rate above which frames of animated GIFs are dropped
+
+    workers : int, default None
+        Number of images optimized at the same time. One per CPU core
+        when None
+
+    Returns
+    -------
+    A new dict of the images and a dict of the names that changed because
+    the image is now in another format
+    """
+    names = [
+        name for name in image_data_dict if Path(name).suffix.lower() in OPTIMIZED_TYPES
+    ]
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(
+            lambda name: optimize_any_image(
+                name, image_data_dict[name], max_width, max_gif_fps
+            ),
+            names,
+        )
+        results = dict(zip(names, results))
+
+    new_image_data_dict = {}
+    renamed = {}
+    total_before = total_after = 0
+    for name, data in image_data_dict.items():
+        result = results.get(name)
+        if result is None:
+            new_image_data_dict[name] = data
+            continue
+        new_data, extension = result
+        new_name = name
+        if Path(name).suffix.lower()[1:] not in (
+            extension,
+            "jpg" if extension == "jpeg" else extension,
+        ):
+            new_name = str(Path(name).with_suffix(f".{extension}"))
+            renamed[name] = new_name
+        new_image_data_dict[new_name] = new_data
+        total_before += len(data)
+        total_after += len(new_data)
+        print(
+            f"optimized {name}: {len(data):,} -> {len(new_data):,} bytes ({1 - len(new_data) / len(data):.0%} smaller)"
+        )
+    if total_before:
+        print(
+            f"optimized images are {total_before - total_after:,} bytes smaller in total"
+        )
+    return new_image_data_dict, renamed
@@ -1,7 +1,7 @@
 import json
 from pathlib import Path
 
-import requests
+from ._http import HTTP_CLIENT
 
 # define github api up top
 GITHUB_API = "https://api.github.com"
@@ -94,8 +94,10 @@ def create_gists(gists, description, output_type="medium", github_token=None, pu
         "public": public,
         "files": files,
     }
-    # make a request
-    res = requests.post(url, headers=headers, params=params, data=json.dumps(payload))
+    # make a request, never sent twice as that would create two gists
+    res = HTTP_CLIENT.post(
+        url, headers=headers, params=params, data=json.dumps(payload), idempotent=False
+    )
     # if 201 response, then proceed, else fail with error
     try:
         # success with gist creation
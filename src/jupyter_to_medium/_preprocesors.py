@@ -1,15 +1,22 @@
 import base64
+from functools import partial
 from pathlib import Path
 import re
 
 import mistune
 from nbconvert.preprocessors import Preprocessor
-import requests
+from nbformat.v4 import new_output
 
 from ._latex import create_attachment_dict
 from ._latex import is_latex_cell
 from ._latex import render_latex
 from ._latex import format_latex
+from ._remote_images import fetch_image
+from ._remote_images import is_linked
+from ._table_css import strip_unused_css
+from ._table_parser import TABLE_SCHEMA_MIMETYPE
+from ._table_parser import is_schema_supported
+from ._text_table import TextTable
 
 
 def get_image_files(md_source, only_http=False):
@@ -40,8 +47,51 @@ def get_image_files(md_source, only_http=False):
     return image_files
 
 
-def replace_md_tables(image_data_dict, md_source, converter, cell_index):
+class TableBatch:
+    """Collects the html of every table found while preprocessing so that
+    they can all be converted together in one call to `run_batch` once the
+    whole notebook has been walked.
+
+    Each table is registered with a callback that receives the base64
+    encoded image of the table when `flush` is called.
+    """
+
+    def __init__(self, run_batch):
+        self.run_batch = run_batch
+        self.jobs = []
+
+    def __call__(self, html, callback):
+        self.jobs.append((html, callback))
+
+    def flush(self):
+        jobs, self.jobs = self.jobs, []
+        if jobs:
+            img_strs = self.run_batch([html for html, _ in jobs])
+            for (_, callback), img_str in zip(jobs, img_strs):
+                callback(img_str)
+
+
+def convert_table(converter, html, callback):
+    """Converts the table immediately or defers it when batching
+
+    The callback receives the base64 encoded image, or a list of them when
+    the converter split a long table into pages.
+    """
+    if isinstance(converter, TableBatch):
+        converter(html, callback)
+    else:
+        callback(converter(html))
+
+
+def is_truncated(html):
+    """pandas only puts the first rows in the table schema of a DataFrame
+    that is too long to display, while the html shows its head and tail"""
+    return "<td>...</td>" in html or "<th>...</th>" in html
+
+
+def replace_md_tables(image_data_dict, cell, converter, cell_index):
     i = 0
+    tables = []
     table = re.compile(r"^ *\|(.+)\n *\|( *[-:]+[-| :]*)\n((?: *\|.*(?:\n|$))*)\n*", re.M)
     nptable = re.compile(r"^ *(\S.*\|.*)\n *([-:]+ *\|[-| :]*)\n((?:.*\|.*(?:\n|$))*)\n*", re.M)
 
@@ -50,15 +100,35 @@ def replace_md_tables(image_data_dict, md_source, converter, cell_index):
         md = match.group()
         html = mistune.markdown(md, escape=False)
         html = "<div>" + html + "</div>"
-        image_data = base64.b64decode(converter(html))
         new_image_name = f"markdown_{cell_index}_table_{i}.png"
-        image_data_dict[new_image_name] = image_data
+        tables.append((new_image_name, html))
         i += 1
         return f"![]({new_image_name})\n"
 
-    md_source = nptable.sub(md_table_to_image, md_source)
-    md_source = table.sub(md_table_to_image, md_source)
-    return md_source
+    md_source = nptable.sub(md_table_to_image, cell["source"])
+    cell["source"] = table.sub(md_table_to_image, md_source)
+
+    # converted after the source is replaced as the callback may need to
+    # add an image for each page of the table
+    for new_image_name, html in tables:
+
+        def store(img_str, name=new_image_name):
+            if isinstance(img_str, TextTable):
+                cell["source"] = cell["source"].replace(
+                    f"![]({name})", img_str.to_markdown()
+                )
+                return
+            if isinstance(img_str, str):
+                image_data_dict[name] = base64.b64decode(img_str)
+                return
+            stem = name[: -len(".png")]
+            page_names = [f"{stem}_page_{j}.png" for j in range(len(img_str))]
+            for page_name, page_str in zip(page_names, img_str):
+                image_data_dict[page_name] = base64.b64decode(page_str)
+            pages_md = "\n\n".join(f"![]({page_name})" for page_name in page_names)
+            cell["source"] = cell["source"].replace(f"![]({name})", pages_md)
+
+        convert_table(converter, html, store)
 
 
 def get_image_tags(md_source, only_http=False):
@@ -85,7 +155,8 @@ class LatexPreprocessor(Preprocessor):
             latex = cell["source"]
             # create it and render it
             latex_fmt = format_latex(latex)
-            latex_rendered = render_latex(latex_fmt)
+            renderer = resources.get("latex_renderer", render_latex)
+            latex_rendered = renderer(latex_fmt)
             # now we need to create a temp file to store it it
             # create encoded str as will decode when processing attachments
             img_str = base64.b64encode(latex_rendered)
@@ -109,10 +180,19 @@ class MarkdownPreprocessor(Preprocessor):
         image_data_dict = resources["image_data_dict"]
         if cell["cell_type"] == "markdown":
             # find all images in this cell using regex
-            all_image_files = get_image_files(cell["source"])
+            all_image_files = get_image_files(cell["source"]) + get_image_files(
+                cell["source"], only_http=True
+            )
+            link_remote_images = resources.get("link_remote_images", True)
 
             # for each image file path identified
             for i, image_file in enumerate(all_image_files):
+                # left for Medium to import from its url, insecure urls are
+                # never downloaded
+                if is_linked(image_file, link_remote_images) or image_file.startswith(
+                    "http://"
+                ):
+                    continue
                 ext = Path(image_file).suffix
                 # correct ext to jpeg if required
                 if ext.startswith(".jpg"):
@@ -120,18 +200,25 @@ class MarkdownPreprocessor(Preprocessor):
                 # new name for the image in the markdown
                 new_image_name = f"markdown_{cell_index}_normal_image_{i}{ext}"
 
-                # if embedded from web link then use requests to grab data
+                # if embedded from web link then download it together with
+                # the images of every other cell once they are all found
                 # only grab from secure urls
                 if "https://" in image_file:
-                    response = requests.get(image_file)
-                    if response.status_code == 200:
-                        image_data = response.content
-                    else:
-                        # unsuccessful request
-                        print(f"Unsuccessful request for image: {image_file}")
-                else:
-                    # read the image data in from the file path
-                    image_data = open(nb_home / image_file, "rb").read()
+
+                    def store(
+                        image_data, image_file=image_file, new_image_name=new_image_name
+                    ):
+                        if image_data is None:
+                            return
+                        cell["source"] = cell["source"].replace(
+                            image_file, new_image_name
+                        )
+                        image_data_dict[new_image_name] = image_data
+
+                    fetch_image(resources.get("image_fetcher"), image_file, store)
+                    continue
+                # read the image data in from the file path
+                image_data = open(nb_home / image_file, "rb").read()
                 # replace the image name in the markdown with the new name
                 cell["source"] = cell["source"].replace(image_file, new_image_name)
                 # add this image to the dict
@@ -168,9 +255,9 @@ class MarkdownPreprocessor(Preprocessor):
                     cell["source"] = cell["source"].replace(f"attachment:{image_name}", new_image_name)
 
             # find markdown tables
-            cell["source"] = replace_md_tables(
+            replace_md_tables(
                 image_data_dict,
-                cell["source"],
+                cell,
                 resources["converter"],
                 cell_index,
             )
@@ -178,30 +265,72 @@ class MarkdownPreprocessor(Preprocessor):
         return cell, resources
 
 
+def store_table_image(outputs, output, img_str):
+    """Replaces the output data with the table image. A long table split
+    into pages gets an output for each page after the first"""
+    if isinstance(img_str, TextTable):
+        output["data"] = {"text/markdown": img_str.to_markdown()}
+        return
+    if isinstance(img_str, str):
+        output["data"] = {"image/png": img_str}
+        return
+    output["data"] = {"image/png": img_str[0]}
+    loc = next(j for j, out in enumerate(outputs) if out is output)
+    outputs[loc + 1 : loc + 1] = [
+        new_output("display_data", data={"image/png": page_str})
+        for page_str in img_str[1:]
+    ]
+
+
 # converts DataFrames to images when not executing notebook first
-# also converts gifs to png for outputs since jinja template is missing this
+# also moves gifs to markdown outputs since jinja template is missing them
 # could write a custom template to handle this
 class NoExecuteDataFramePreprocessor(Preprocessor):
     def preprocess_cell(self, cell, resources, index):
         converter = resources["converter"]
+        schema_converter = resources.get("schema_converter")
         if cell["cell_type"] == "code":
             outputs = cell.get("outputs", [])
-            for output in outputs:
+            for j, output in enumerate(outputs):
                 if "data" in output:
                     has_image_mimetype = False
                     for key, value in output["data"].items():
                         if key.startswith("image"):
                             has_image_mimetype = True
                             if key == "image/gif":
-                                # gifs not in jinja template
-                                key = "image/png"
-                            output["data"] = {key: value}
+                                # gifs are not in the jinja template so the
+                                # gif is linked from markdown instead, which
+                                # keeps its mime type and its animation
+                                name = f"output_{index}_{j}.gif"
+                                resources["image_data_dict"][name] = base64.b64decode(
+                                    value
+                                )
+                                output["data"] = {"text/markdown": f"![]({name})"}
+                            else:
+                                output["data"] = {key: value}
                             break
 
                     if not has_image_mimetype and "text/html" in output["data"]:
                         html = output["data"]["text/html"]
-                        if "</table>" in html and "</style>" in html:
-                            output["data"] = {"image/png": converter(html)}
+                        table_schema = output["data"].get(TABLE_SCHEMA_MIMETYPE)
+                        if (
+                            schema_converter
+                            and table_schema
+                            and not is_truncated(html)
+                            and is_schema_supported(table_schema)
+                        ):
+                            # skips parsing the html back into rows
+                            store_table_image(
+                                outputs, output, schema_converter(table_schema)
+                            )
+                        elif "</table>" in html and "</style>" in html:
+                            # styled DataFrames carry a css rule per cell
+                            html, removed = strip_unused_css(html)
+                            if removed > 0:
+                                print(f"removed {removed:,} bytes of table css")
+
+                            store = partial(store_table_image, outputs, output)
+                            convert_table(converter, html, store)
                         elif html.startswith("<img src"):
                             # TODO: Necessary when images
                             # from IPython.display module used
@@ -1,15 +1,87 @@
+import hashlib
 import json
+import time
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-import requests
 import nbformat
 from nbconvert.exporters import MarkdownExporter
 
+from ._daemon import connect_daemon
+from ._http import HTTP_CLIENT
+from ._latex import render_latex
 from ._postprocessors import gistPostprocessor
 from ._preprocesors import MarkdownPreprocessor
 from ._preprocesors import NoExecuteDataFramePreprocessor
 from ._preprocesors import LatexPreprocessor
+from ._preprocesors import TableBatch
+from ._optimize_images import optimize_images
+from ._remote_images import RemoteImageFetcher
+from ._render_cache import CACHE_DIR, RenderCache
+
+# Medium urls of the images uploaded before, keyed by the sha256 of the image
+UPLOAD_CACHE = RenderCache(
+    CACHE_DIR / "medium_images", max_bytes=10_000_000, memo_size=0
+)
+# author id and publication ids, keyed by the sha256 of the integration token
+ACCOUNT_CACHE = RenderCache(
+    CACHE_DIR / "medium_accounts", max_bytes=1_000_000, memo_size=0
+)
+ACCOUNT_TTL = 7 * 24 * 60 * 60
+
+
+def create_table_converter(
+    table_conversion, chrome_path=None, table_workers=None, table_page_rows=None
+):
+    """Creates the object used to convert html tables into images
+
+    Parameters
+    ----------
+    table_conversion : 'chrome', 'matplotlib', 'pillow', 'text' or 'auto'
+        Which library produces the table images. 'text' lays tables out
+        as fixed-width text instead of images. 'auto' picks chrome or
+        pillow for each table
+
+    chrome_path : str, default None
+        Path to the chrome executable. Found automatically when None.
+
+    table_workers : int, default None
+        Number of chrome tabs converting tables in parallel
+
+    table_page_rows : int, default None
+        Maximum number of rows in each image of a long table made with
+        matplotlib or pillow
+    """
+    if table_conversion == "chrome":
+        from ._screenshot import ScreenshotPool
+
+        return ScreenshotPool(
+            workers=table_workers,
+            center_df=True,
+            fontsize=14,
+            chrome_path=chrome_path,
+        )
+    elif table_conversion == "auto":
+        from ._table_router import TableRouter
+
+        return TableRouter(
+            lambda engine: create_table_converter(
+                engine, chrome_path, table_workers, table_page_rows
+            )
+        )
+    elif table_conversion == "text":
+        from ._text_table import TextTableMaker
+
+        return TextTableMaker()
+    elif table_conversion == "pillow":
+        from ._pillow_table import PillowTableMaker
+
+        return PillowTableMaker(fontsize=22, max_page_rows=table_page_rows)
+    else:
+        from ._matplotlib_table import TableMaker
+
+        return TableMaker(fontsize=22, max_page_rows=table_page_rows)
 
 
 class Publish:
@@ -38,6 +110,13 @@ class Publish:
         gistify,
         gist_threshold,
         public_gists=True,
+        table_workers=None,
+        table_page_rows=None,
+        upload_workers=8,
+        link_remote_images=True,
+        optimize_images=True,
+        max_image_width=1400,
+        max_gif_fps=None,
     ):
         self.filename = Path(filename)
         self.img_data_json = self.filename.stem + "_image_data.json"
@@ -55,10 +134,18 @@ class Publish:
         self.gistify = gistify
         self.gist_threshold = gist_threshold
         self.public_gists = public_gists
+        self.table_workers = table_workers
+        self.table_page_rows = table_page_rows
+        self.upload_workers = upload_workers
+        HTTP_CLIENT.set_limit("api.medium.com", max(upload_workers, 1))
+        self.link_remote_images = link_remote_images
+        self.optimize_images = optimize_images
+        self.max_image_width = max_image_width
+        self.max_gif_fps = max_gif_fps
+        self.headers = self.get_headers()
         self.nb_home = self.filename.parent
         self.resources = self.get_resources()
         self.nb = self.get_notebook()
-        self.headers = self.get_headers()
         self.validate_args()
 
     def validate_args(self):
@@ -82,8 +169,16 @@ class Publish:
         if not isinstance(self.tags, list):
             raise TypeError("Must use a list of strings for the tags and not", self.tags)
 
-        if self.table_conversion not in ("chrome", "matplotlib"):
-            raise ValueError('`table_version` must be either "chrome" or "matplotlib"')
+        if self.table_conversion not in (
+            "chrome",
+            "matplotlib",
+            "pillow",
+            "text",
+            "auto",
+        ):
+            raise ValueError(
+                '`table_version` must be one of "chrome", "matplotlib", "pillow", "text" or "auto"'
+            )
 
     def get_resources(self):
         """Creates a dict of meta data to be passed around during conversion
@@ -94,18 +189,48 @@ class Publish:
             dict: Dict contaning path to and name of notebook and table
             converter instance
         """
-        if self.table_conversion == "chrome":
-            from ._screenshot import Screenshot
-
-            converter = Screenshot(center_df=True, fontsize=14, chrome_path=self.chrome_path).run
+        # hand rendering to the render daemon when one is running as it
+        # already has chrome and matplotlib warmed up
+        daemon = connect_daemon()
+        if daemon is not None and self.table_conversion == "text":
+            # text tables need nothing warmed up and can't be sent as images
+            self.table_converter = create_table_converter("text")
+            latex_renderer = daemon.render_latex
+        elif daemon is not None:
+            print("rendering with the jupyter_to_medium daemon")
+            self.table_converter = daemon.table_converter(
+                self.table_conversion,
+                self.chrome_path,
+                self.table_workers,
+                self.table_page_rows,
+            )
+            latex_renderer = daemon.render_latex
         else:
-            from ._matplotlib_table import TableMaker
-
-            converter = TableMaker(fontsize=22).run
+            self.table_converter = create_table_converter(
+                self.table_conversion,
+                self.chrome_path,
+                self.table_workers,
+                self.table_page_rows,
+            )
+            latex_renderer = render_latex
+
+        # converters that can render many tables at once get all of them
+        # together after the notebook has been preprocessed
+        if hasattr(self.table_converter, "run_batch"):
+            converter = TableBatch(self.table_converter.run_batch)
+        else:
+            converter = self.table_converter.run
 
         resources = {
             "metadata": {"path": str(self.nb_home), "name": self.title},
             "converter": converter,
+            # renders DataFrames straight from their table schema output
+            # data when the converter can
+            "schema_converter": getattr(self.table_converter, "run_table_schema", None),
+            "latex_renderer": latex_renderer,
+            # downloads the remote images of every cell at the same time
+            "image_fetcher": RemoteImageFetcher(),
+            "link_remote_images": self.link_remote_images,
             "image_data_dict": {},
         }
         return resources
@@ -128,8 +253,46 @@ class Publish:
         }
         return headers
 
+    def get_account_key(self):
+        return ACCOUNT_CACHE.make_key("medium_account", self.integration_token)
+
+    def load_account(self):
+        """Returns the ids cached for the integration token, or an empty
+        dict when there are none or they are older than `ACCOUNT_TTL`"""
+        data = ACCOUNT_CACHE.get(self.get_account_key())
+        try:
+            account = json.loads(data)
+        except (TypeError, ValueError):
+            return {}
+        if time.time() - account.get("time", 0) > ACCOUNT_TTL:
+            return {}
+        return account
+
+    def save_account(self, account):
+        account["time"] = account.get("time", time.time())
+        ACCOUNT_CACHE.put(self.get_account_key(), json.dumps(account).encode())
+
+    def get_ids(self):
+        """Returns the author and publication ids, from the cache when it
+        has them, so that publishing usually skips both requests"""
+        account = self.load_account()
+        if account.get("author_id"):
+            self.author_id = account["author_id"]
+        else:
+            self.author_id = self.get_author_id()
+            account = {"author_id": self.author_id, "pub_ids": {}}
+        pub_ids = account.setdefault("pub_ids", {})
+        if self.pub_name in pub_ids:
+            self.pub_id = pub_ids[self.pub_name]
+        else:
+            self.pub_id = self.get_pub_id()
+            if self.pub_name:
+                pub_ids[self.pub_name] = self.pub_id
+            self.save_account(account)
+        return self.author_id, self.pub_id
+
     def get_author_id(self):
-        r = requests.get(self.AUTHOR_URL, headers=self.headers)
+        r = HTTP_CLIENT.get(self.AUTHOR_URL, headers=self.headers)
         try:
             return r.json()["data"]["id"]
         except KeyError:
@@ -139,7 +302,7 @@ class Publish:
         if not self.pub_name:
             return ""
         pub_url = self.PUB_URL.format(author_id=self.author_id)
-        r = requests.get(pub_url, headers=self.headers)
+        r = HTTP_CLIENT.get(pub_url, headers=self.headers)
         try:
             data = r.json()["data"]
         except KeyError:
@@ -152,22 +315,35 @@ class Publish:
 
     def create_markdown(self):
 
-        # need to convert latex here before markdown preprocessor runs
-        # as the mp will handle our images for us into image_data_dict
-        lp = LatexPreprocessor()
-        lp.preprocess(self.nb, self.resources)
-
-        # this is where the magic happens - image conversion etc
-        mp = MarkdownPreprocessor()
-        mp.preprocess(self.nb, self.resources)
-
-        no_ex_pp = NoExecuteDataFramePreprocessor()
-        no_ex_pp.preprocess(self.nb, self.resources)
+        try:
+            # need to convert latex here before markdown preprocessor runs
+            # as the mp will handle our images for us into image_data_dict
+            lp = LatexPreprocessor()
+            lp.preprocess(self.nb, self.resources)
+
+            # this is where the magic happens - image conversion etc
+            mp = MarkdownPreprocessor()
+            mp.preprocess(self.nb, self.resources)
+
+            no_ex_pp = NoExecuteDataFramePreprocessor()
+            no_ex_pp.preprocess(self.nb, self.resources)
+
+            # convert any tables collected for batch conversion
+            if isinstance(self.resources["converter"], TableBatch):
+                self.resources["converter"].flush()
+            self.resources["image_fetcher"].flush()
+        finally:
+            # all tables are converted so shut down the browser if one
+            # was kept alive for the screenshots
+            self.close_table_converter()
 
         # MarkdownExporter converts images to base64 bytes automatically
         # MarkdownExporter deep copies resources and fails when matplotlib
         # must remove converter key to not error
         self.resources.pop("converter")
+        self.resources.pop("schema_converter")
+        self.resources.pop("latex_renderer")
+        self.resources.pop("image_fetcher")
         me = MarkdownExporter()
         md, self.resources = me.from_notebook_node(self.nb, self.resources)
 
@@ -177,6 +353,11 @@ class Publish:
         }
         return md, image_data_dict
 
+    def close_table_converter(self):
+        close = getattr(self.table_converter, "close", None)
+        if close is not None:
+            close()
+
     def gistify_markdown(self):
         if self.gistify:
             # list-ify the markdown --> ``` elements identify code blocks
@@ -209,6 +390,15 @@ class Publish:
             with open(full_path, "a") as f:
                 f.write(self.gist_url+"\n")
 
+    def optimize_image_data(self):
+        """Shrinks the images and points the markdown to the new name of
+        those that changed format"""
+        self.image_data_dict, renamed = optimize_images(
+            self.image_data_dict, self.max_image_width, self.max_gif_fps
+        )
+        for name, new_name in renamed.items():
+            self.md = self.md.replace(name, new_name)
+
     def load_images_to_medium(self):
         """
         Assumption here is that the image dict has the following format
@@ -219,29 +409,86 @@ class Publish:
         must be present in the source so the final operation to place the
         link to the Medium servers where the images get uploaded works
         """
-        all_json = []
+        # identical images are only uploaded once, and not at all when an
+        # earlier publish already uploaded them
+        images = []
+        files_by_hash = {}
         for file, data in self.image_data_dict.items():
-            fp = Path(file)
-            extension = fp.suffix[1:].lower()
+            extension = Path(file).suffix[1:].lower()
             if extension in self.IMAGE_TYPES:
-                print("loading image to medium")
-                name = fp.stem
-                file_payload = {"image": (name, data, f"image/{extension}")}
-                r = requests.post(self.IMAGE_URL, headers=self.headers, files=file_payload)
-                req_json = r.json()
-                try:
-                    new_url = req_json["data"]["url"]
-                except KeyError:
-                    raise ValueError("Problem loading image {name}.{extension} to Medium: " + r.text)
-                # this is the line that updates the markdown to point to the
-                # Medium image servers for the uploaded images
-                self.md = self.md.replace(file, new_url)
-                all_json.append(req_json)
+                digest = hashlib.sha256(data).hexdigest()
+                images.append((file, digest))
+                files_by_hash.setdefault(digest, []).append((file, data))
+        if not images:
+            return
+
+        urls = {}
+        uploads = []
+        for digest, files in files_by_hash.items():
+            url = UPLOAD_CACHE.get(digest)
+            if url is not None:
+                urls[digest] = url.decode()
+            else:
+                uploads.append((digest, *files[0]))
+        print(
+            f"loading {len(uploads)} images to medium, "
+            f"{len(images) - len(uploads)} already uploaded or duplicated"
+        )
+
+        # the largest images are started first as they take the longest
+        uploads.sort(key=lambda upload: len(upload[2]), reverse=True)
+        workers = max(min(self.upload_workers, len(uploads)), 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                digest: executor.submit(self.upload_image, file, data)
+                for digest, file, data in uploads
+            }
+
+        all_json = []
+        errors = []
+        for digest, file, _ in uploads:
+            try:
+                req_json = futures[digest].result()
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            urls[digest] = req_json["data"]["url"]
+            UPLOAD_CACHE.put(digest, urls[digest].encode())
+            all_json.append(req_json)
+
+        if errors:
+            raise ValueError(
+                f"{len(errors)} of {len(uploads)} images failed to load to Medium:\n"
+                + "\n".join(errors)
+            )
+
+        # replace the links in the order of the notebook so that the
+        # markdown is the same whichever upload finishes first
+        for file, digest in images:
+            # this is the line that updates the markdown to point to the
+            # Medium image servers for the uploaded images
+            self.md = self.md.replace(file, urls[digest])
 
         print("\n\nImage Storage Information from Medium")
         print("-------------------------------------\n")
         print(json.dumps(all_json, indent=4))
 
+    def upload_image(self, file, data):
+        """Uploads a single image and returns the json response"""
+        fp = Path(file)
+        extension = fp.suffix[1:].lower()
+        name = fp.stem
+        file_payload = {"image": (name, data, f"image/{extension}")}
+        r = HTTP_CLIENT.post(self.IMAGE_URL, headers=self.headers, files=file_payload)
+        try:
+            req_json = r.json()
+            req_json["data"]["url"]
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(
+                f"Problem loading image {name}.{extension} to Medium: " + r.text
+            )
+        return req_json
+
     def save(self):
         # save markdown and add extra image files
         if self.save_markdown:
@@ -282,7 +529,18 @@ class Publish:
             json_data["tags"] = self.tags
 
         # add 30s timeout to prevent timeout response for large articles
-        req = requests.post(post_url, headers=self.headers, json=json_data, timeout=30)
+        # and never send the post twice when Medium may have created it
+        req = HTTP_CLIENT.post(
+            post_url,
+            headers=self.headers,
+            json=json_data,
+            timeout=(5, 30),
+            idempotent=False,
+        )
+        # the cached ids may belong to a revoked token or a publication
+        # the author can no longer post to
+        if req.status_code in (401, 403):
+            ACCOUNT_CACHE.delete(self.get_account_key())
         try:
             self.result = req.json()
         except Exception:
@@ -301,10 +559,12 @@ class Publish:
             print("--------------------------------")
             for k, v in data["data"].items():
                 print(f"{k:20}{v}")
+        print("\nRequests")
+        print("--------")
+        HTTP_CLIENT.print_stats()
 
     def main(self):
-        self.author_id = self.get_author_id()
-        self.pub_id = self.get_pub_id()
+        self.author_id, self.pub_id = self.get_ids()
         # this is the main function for converting images etc
         self.md, self.image_data_dict = self.create_markdown()
         # check if we want to convert code blocks to gists
@@ -313,6 +573,10 @@ class Publish:
         # save the urls of the gists we just created
         # this enables us to delete them later
         self.save_gist_urls()
+        # recompress and downscale the images before they are saved and
+        # uploaded
+        if self.optimize_images:
+            self.optimize_image_data()
         # create copy of the markdown for saving
         # markdown to be uploaded to Medium needs links to
         # images that are stored on Medium server, not locally
@@ -344,6 +608,13 @@ def publish(
     gistify=False,
     gist_threshold=5,
     public_gists=True,
+    table_workers=None,
+    table_page_rows=None,
+    upload_workers=8,
+    link_remote_images=True,
+    optimize_images=True,
+    max_image_width=1400,
+    max_gif_fps=None,
 ):
     """
     Publish a Jupyter Notebook directly to Medium as a blog post.
@@ -406,12 +677,18 @@ def publish(
         They will be placed in the same folder containing the notebook.
         The images will be in a folder with _files appended to it.
 
-    table_conversion : 'chrome' or 'matplotlib', default 'chrome'
+    table_conversion : 'chrome', 'matplotlib', 'pillow', 'text' or 'auto', default 'chrome'
         Medium does not render tables correctly such as pandas DataFrames.
         As a workaround, images of the tables will be produced in their place.
         When 'chrome', a screenshot using the Chrome web browser will be used.
         When 'matplotlib', the matplotlib table function will be used to
-        produce the table.
+        produce the table. When 'pillow', the same table as 'matplotlib' is
+        drawn directly with Pillow, which is much faster. When 'text', no
+        images are made and tables are placed in code blocks as aligned
+        text, with long cells and extra columns truncated. Useful for
+        quick drafts. When 'auto', plain tables are drawn with Pillow and
+        only tables with Styler CSS, merged cells or html inside their
+        cells are sent to Chrome. The choice made for each table is printed.
 
     gistify: bool, default `False`
         Medium has poor formatting for embedded code. To prevent chunks of
@@ -428,6 +705,46 @@ def publish(
     public_gists: bool, default `True`
         Whether to create the gists as public (can be found by search engines)
         or private (only accessible through link).
+
+    table_workers: int, default None
+        Number of Chrome tabs used to screenshot tables in parallel when
+        `table_conversion` is 'chrome'. When None, one tab per CPU core is
+        used. The number of tabs is always capped by the available memory.
+
+    table_page_rows: int, default None
+        Maximum number of rows in each image when `table_conversion` is
+        'matplotlib' or 'pillow'. Longer tables are split into several images placed one
+        after the other, each repeating the header. When None, tables are
+        only split when an image would be over 16,000 pixels tall.
+
+    upload_workers: int, default 8
+        Number of images uploaded to Medium at the same time
+
+    link_remote_images: bool or list of str, default `True`
+        Whether images in markdown that are already online are left as
+        links for Medium to import when the post is created, instead of
+        being downloaded and uploaded again. Use a list of hosts such as
+        `['cdn.example.com']` to only link the images on those hosts and
+        their subdomains and download the others, for instance when some
+        hosts need a login that Medium does not have. Use `False` to
+        download every image served over https.
+
+    optimize_images: bool, default `True`
+        Whether to make the images smaller before they are saved and
+        uploaded. Images wider than `max_image_width` are downscaled,
+        and each is stored as a PNG, a PNG with a palette of 256 colors or
+        a JPEG, whichever is smallest while looking the same.
+
+    max_image_width: int, default 1400
+        Width in pixels above which images are downscaled when
+        `optimize_images` is True. Medium shows images at most about
+        1400 pixels wide.
+
+    max_gif_fps: float, default None
+        Frame rate above which frames of animated GIFs are dropped when
+        `optimize_images` is True. Animated GIFs always have duplicate
+        frames merged and share one palette. When None, no frames are
+        dropped for their timing.
     """
     p = Publish(
         filename,
@@ -445,6 +762,13 @@ def publish(
         gistify,
         gist_threshold,
         public_gists,
+        table_workers,
+        table_page_rows,
+        upload_workers,
+        link_remote_images,
+        optimize_images,
+        max_image_width,
+        max_gif_fps,
     )
     p.main()
     return p.result
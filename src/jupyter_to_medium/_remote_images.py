@@ -0,0 +1,159 @@
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+from ._http import HTTP_CLIENT
+from ._render_cache import CACHE_DIR, RenderCache
+
+# images downloaded before along with the headers needed to revalidate them
+HTTP_CACHE = RenderCache(CACHE_DIR / "http", max_bytes=200_000_000, memo_size=0)
+MAX_AGE = re.compile(r"max-age\s*=\s*(\d+)", re.I)
+
+
+def get_expiry(headers, now):
+    """Returns when the response stops being fresh as a unix time, or None
+    when it must be revalidated before every use"""
+    cache_control = headers.get("Cache-Control", "").lower()
+    if "no-cache" in cache_control or "must-revalidate" in cache_control:
+        return None
+    match = MAX_AGE.search(cache_control)
+    if match:
+        return now + int(match.group(1))
+    if headers.get("Expires"):
+        try:
+            return parsedate_to_datetime(headers["Expires"]).timestamp()
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def pack(meta, content):
+    return json.dumps(meta).encode() + b"\n" + content
+
+
+def unpack(data):
+    meta, content = data.split(b"\n", 1)
+    return json.loads(meta), content
+
+
+class RemoteImageFetcher:
+    """
+    Collects the urls of the remote images found while preprocessing and
+    downloads all of them at once, in parallel, when `flush` is called.
+    Failed requests are retried by the shared HTTP client.
+
+    Responses are kept on disk with their ETag and Last-Modified headers.
+    A cached image still fresh according to Cache-Control or Expires is
+    used without any request. Otherwise a conditional request is sent and
+    the cached image is used when the server answers 304. When a request
+    fails, a stale cached image is used if there is one.
+
+    Each url is registered with a callback that receives the image bytes,
+    or None when the image could not be fetched.
+
+    Parameters
+    ----------
+    workers : int, default 8
+        Number of images downloaded at the same time
+
+    timeout : tuple of float, default (5, 30)
+        Connect and read timeouts of each request in seconds
+    """
+
+    def __init__(self, workers=8, timeout=(5, 30)):
+        self.workers = workers
+        self.timeout = timeout
+        self.jobs = []
+
+    def __call__(self, url, callback):
+        self.jobs.append((url, callback))
+
+    def fetch(self, url):
+        """Returns the bytes of the image at the url or None"""
+        key = HTTP_CACHE.make_key("http", url)
+        cached = HTTP_CACHE.get(key)
+        meta, content = unpack(cached) if cached is not None else ({}, None)
+        now = time.time()
+        if content is not None and meta.get("expires") and meta["expires"] > now:
+            return content
+
+        headers = {}
+        if content is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            response = HTTP_CLIENT.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"Unsuccessful request for image: {url} ({e})")
+            return content
+
+        if response.status_code == 304 and content is not None:
+            meta["expires"] = get_expiry(response.headers, now)
+            HTTP_CACHE.put(key, pack(meta, content))
+            return content
+        if response.status_code != 200:
+            print(f"Unsuccessful request for image: {url} ({response.status_code})")
+            return content
+
+        content = response.content
+        if "no-store" not in response.headers.get("Cache-Control", "").lower():
+            meta = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "expires": get_expiry(response.headers, now),
+            }
+            HTTP_CACHE.put(key, pack(meta, content))
+        return content
+
+    def flush(self):
+        jobs, self.jobs = self.jobs, []
+        urls = list(dict.fromkeys(url for url, _ in jobs))
+        if not urls:
+            return
+        workers = max(min(self.workers, len(urls)), 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = dict(zip(urls, executor.map(self.fetch, urls)))
+        for url, callback in jobs:
+            callback(results[url])
+
+
+def fetch_image(fetcher, url, callback):
+    """Defers the download to the fetcher or downloads the image
+    immediately when there is none"""
+    if fetcher is None:
+        fetcher = RemoteImageFetcher(workers=1)
+        fetcher(url, callback)
+        fetcher.flush()
+    else:
+        fetcher(url, callback)
+
+
+def is_linked(url, link_remote_images):
+    """
+    Returns whether a remote image is left as a link for Medium to import
+    instead of being downloaded and uploaded again
+
+    Parameters
+    ----------
+    url : str
+
+    link_remote_images : bool or list of str
+        True links every remote image. A list links only the images on
+        those hosts or their subdomains
+    """
+    if not link_remote_images or not url.startswith(("http://", "https://")):
+        return False
+    if link_remote_images is True:
+        return True
+    host = (urlsplit(url).hostname or "").lower()
+    return any(
+        host == allowed or host.endswith("." + allowed)
+        for allowed in map(str.lower, link_remote_images)
+    )
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+CACHE_DIR = Path.home() / ".jupyter_to_medium" / "cache"
+
+
+class RenderCache:
+    """
+    Keeps rendered images on disk, addressed by the hash of everything that
+    went into rendering them, with an in-process LRU memo on top.
+
+    Files are evicted least recently used first once the directory grows
+    past `max_bytes`. Reading a file marks it as used by updating its
+    modification time. Failing to read or write the cache never fails the
+    render, the image is just made again. It can be used from several
+    threads at once.
+
+    Parameters
+    ----------
+    directory : str or Path
+        Where the files are kept. Created when first written to
+
+    max_bytes : int, default 50_000_000
+        Size of the directory above which old files are removed
+
+    memo_size : int, default 256
+        Number of images also kept in memory
+    """
+
+    def __init__(self, directory, max_bytes=50_000_000, memo_size=256):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.memo_size = memo_size
+        self.memo = OrderedDict()
+        self.size = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts):
+        """Hashes the json of the parts, which must all be json serializable"""
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+    def remember(self, key, data):
+        self.memo[key] = data
+        self.memo.move_to_end(key)
+        while len(self.memo) > self.memo_size:
+            self.memo.popitem(last=False)
+
+    def get(self, key):
+        """Returns the bytes stored under the key or None"""
+        with self.lock:
+            data = self.memo.get(key)
+            if data is not None:
+                self.memo.move_to_end(key)
+                return data
+            path = self.directory / key
+            try:
+                data = path.read_bytes()
+                os.utime(path)
+            except OSError:
+                return None
+            self.remember(key, data)
+            return data
+
+    def put(self, key, data):
+        with self.lock:
+            self.remember(key, data)
+            path = self.directory / key
+            # written to a temporary file first so that a concurrent reader,
+            # such as the render daemon, never sees half a file
+            tmp_path = path.with_name(f"{key}.{os.getpid()}.tmp")
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, path)
+            except OSError:
+                return
+            if self.size is None:
+                self.size = sum(
+                    entry.stat().st_size
+                    for entry in os.scandir(self.directory)
+                    if entry.is_file()
+                )
+            else:
+                self.size += len(data)
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def delete(self, key):
+        with self.lock:
+            self.memo.pop(key, None)
+            try:
+                os.unlink(self.directory / key)
+            except OSError:
+                pass
+            self.size = None
+
+    def evict(self):
+        """Removes the least recently used files until the directory is
+        below 80% of `max_bytes`. Called with the lock held."""
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry))
+        files.sort(key=lambda file: file[0])
+        size = sum(file_size for _, file_size, _ in files)
+        for _, file_size, entry in files:
+            if size <= 0.8 * self.max_bytes:
+                break
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                continue
+            size -= file_size
+            self.memo.pop(entry.name, None)
+        self.size = size
+
+    def get_or_render(self, key, render):
+        """Returns the cached bytes for the key, calling `render` to make
+        and store them when missing"""
+        data = self.get(key)
+        if data is None:
+            data = render()
+            self.put(key, data)
+        return data
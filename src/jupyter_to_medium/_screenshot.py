@@ -3,13 +3,58 @@ import shutil
 import subprocess
 import base64
 import io
+import json
+import os
+import socket
+import struct
+import time
+import tracemalloc
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from tempfile import TemporaryDirectory
+from tempfile import mkdtemp
 
 import numpy as np
-from matplotlib import image as mimage
+from PIL import Image
 
 MAX_CROP = 0.22
+# channels this close to 255 still count as white background so that
+# anti-aliased edges do not stop the crop
+WHITE_TOLERANCE = 8
+# rough upper bound of the memory used by one tab rendering a large table
+MEMORY_PER_TAB = 250 * 2 ** 20
+
+# lets the tables grow to their natural width and returns the union of the
+# bounding boxes of the tables and captions (e.g. "5 rows x 3 columns")
+# found inside each root element
+MEASURE_JS = """
+(() => {
+    document.body.style.width = "max-content";
+    const measure = (root) => {
+        let left = Infinity, top = Infinity, right = -Infinity, bottom = -Infinity;
+        for (const el of root.querySelectorAll("table, p")) {
+            const r = el.getBoundingClientRect();
+            if (r.width === 0 || r.height === 0) {
+                continue;
+            }
+            left = Math.min(left, r.left);
+            top = Math.min(top, r.top);
+            right = Math.max(right, r.right);
+            bottom = Math.max(bottom, r.bottom);
+        }
+        if (left === Infinity) {
+            return null;
+        }
+        return {
+            x: Math.floor(left + window.scrollX),
+            y: Math.floor(top + window.scrollY),
+            width: Math.ceil(right - left),
+            height: Math.ceil(bottom - top),
+        };
+    };
+    return %s;
+})()
+"""
 
 
 def get_system():
@@ -73,7 +118,253 @@ def get_chrome_path(chrome_path=None):
         raise OSError("Cannot find chrome.exe on your windows machine")
 
 
+def get_available_memory():
+    """Returns the available physical memory in bytes or None when it
+    cannot be determined on this system"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def get_tab_count(workers=None):
+    """Number of tabs to render tables with in parallel. Never more than
+    the number of cores or than fits in the available memory."""
+    max_workers = os.cpu_count() or 1
+    memory = get_available_memory()
+    if memory is not None:
+        max_workers = min(max_workers, memory // MEMORY_PER_TAB)
+    if workers is not None:
+        max_workers = min(max_workers, workers)
+    return max(max_workers, 1)
+
+
+class DevToolsConnection:
+    """Minimal websocket client speaking the Chrome DevTools protocol
+
+    Only the parts of RFC 6455 needed to talk to a local Chrome are
+    implemented: masked text frames out, unmasked (possibly fragmented)
+    frames in.
+    """
+
+    def __init__(self, port, path, timeout=30):
+        self.sock = socket.create_connection(("127.0.0.1", port), timeout=timeout)
+        self.file = self.sock.makefile("rb")
+        self.msg_id = 0
+        key = base64.b64encode(os.urandom(16)).decode()
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: 127.0.0.1:{port}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        )
+        self.sock.sendall(request.encode())
+        status = self.file.readline()
+        if b" 101 " not in status:
+            raise OSError(
+                f"Could not connect to Chrome DevTools: {status.decode().strip()}"
+            )
+        # skip the rest of the handshake response headers
+        while self.file.readline() not in (b"\r\n", b""):
+            pass
+
+    def send_frame(self, payload, opcode=0x1):
+        n = len(payload)
+        header = bytearray([0x80 | opcode])
+        if n < 126:
+            header.append(0x80 | n)
+        elif n < 1 << 16:
+            header.append(0x80 | 126)
+            header += struct.pack("!H", n)
+        else:
+            header.append(0x80 | 127)
+            header += struct.pack("!Q", n)
+        mask = os.urandom(4)
+        masked = np.frombuffer(payload, dtype=np.uint8) ^ np.resize(
+            np.frombuffer(mask, dtype=np.uint8), n
+        )
+        self.sock.sendall(bytes(header) + mask + masked.tobytes())
+
+    def recv_message(self):
+        chunks = []
+        while True:
+            head = self.file.read(2)
+            if len(head) < 2:
+                raise ConnectionError("Chrome DevTools connection closed")
+            opcode = head[0] & 0x0F
+            n = head[1] & 0x7F
+            if n == 126:
+                n = struct.unpack("!H", self.file.read(2))[0]
+            elif n == 127:
+                n = struct.unpack("!Q", self.file.read(8))[0]
+            payload = self.file.read(n)
+            if opcode == 0x8:
+                raise ConnectionError("Chrome DevTools connection closed")
+            elif opcode == 0x9:
+                self.send_frame(payload, opcode=0xA)
+                continue
+            elif opcode == 0xA:
+                continue
+            chunks.append(payload)
+            if head[0] & 0x80:
+                return b"".join(chunks)
+
+    def send(self, method, **params):
+        """Send a command and block until its response arrives. Any events
+        received in the meantime are discarded."""
+        self.msg_id += 1
+        message = {"id": self.msg_id, "method": method, "params": params}
+        self.send_frame(json.dumps(message).encode())
+        while True:
+            response = json.loads(self.recv_message())
+            if response.get("id") == self.msg_id:
+                if "error" in response:
+                    raise OSError(
+                        f"Chrome DevTools error for {method}: {response['error']}"
+                    )
+                return response.get("result", {})
+
+    def close(self):
+        try:
+            self.file.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ChromeTab:
+    """A single page of a ChromeSession that html is loaded into and
+    screenshots are taken from"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.frame_id = conn.send("Page.getFrameTree")["frameTree"]["frame"]["id"]
+
+    def set_viewport(self, width, height):
+        self.conn.send(
+            "Emulation.setDeviceMetricsOverride",
+            width=width,
+            height=height,
+            deviceScaleFactor=1,
+            mobile=False,
+        )
+
+    def set_content(self, html):
+        self.conn.send("Page.setDocumentContent", frameId=self.frame_id, html=html)
+
+    def evaluate(self, expression):
+        result = self.conn.send(
+            "Runtime.evaluate", expression=expression, returnByValue=True
+        )
+        return result["result"].get("value")
+
+    def screenshot(self, clip=None):
+        params = {"format": "png"}
+        if clip:
+            params["clip"] = {**clip, "scale": 1}
+            params["captureBeyondViewport"] = True
+        data = self.conn.send("Page.captureScreenshot", **params)["data"]
+        return base64.b64decode(data)
+
+    def close(self):
+        self.conn.close()
+
+
+def _shutdown_chrome(proc, user_data_dir):
+    if proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+    shutil.rmtree(user_data_dir, ignore_errors=True)
+
+
+class ChromeSession:
+    """One headless Chrome process that stays alive for many screenshots
+
+    Chrome picks a free debugging port and writes it to the
+    DevToolsActivePort file of its profile directory. Pages are then
+    driven over a websocket connection each.
+    """
+
+    def __init__(self, chrome_path, timeout=30):
+        self.chrome_path = chrome_path
+        self.timeout = timeout
+        self.user_data_dir = mkdtemp(prefix="jupyter_to_medium_chrome_")
+        args = [
+            self.chrome_path,
+            "--headless",
+            "--disable-gpu",
+            "--hide-scrollbars",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "--remote-debugging-port=0",
+            f"--user-data-dir={self.user_data_dir}",
+            "about:blank",
+        ]
+        self.proc = subprocess.Popen(
+            args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        # make sure chrome does not outlive the python process
+        self._finalizer = weakref.finalize(
+            self, _shutdown_chrome, self.proc, self.user_data_dir
+        )
+        self.port, browser_path = self.read_devtools_port()
+        self.browser = DevToolsConnection(self.port, browser_path, timeout)
+
+    def read_devtools_port(self):
+        port_file = Path(self.user_data_dir) / "DevToolsActivePort"
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise OSError(
+                    f"Chrome exited unexpectedly with code {self.proc.returncode}"
+                )
+            if port_file.exists():
+                lines = port_file.read_text().splitlines()
+                if len(lines) >= 2:
+                    return int(lines[0]), lines[1]
+            time.sleep(0.05)
+        raise OSError("Timed out waiting for Chrome to start")
+
+    def new_tab(self):
+        # a separate browser context per tab gives each its own renderer
+        # process so that tabs can lay out and paint in parallel
+        context_id = self.browser.send("Target.createBrowserContext")[
+            "browserContextId"
+        ]
+        target_id = self.browser.send(
+            "Target.createTarget",
+            url="about:blank",
+            browserContextId=context_id,
+        )["targetId"]
+        conn = DevToolsConnection(
+            self.port, f"/devtools/page/{target_id}", self.timeout
+        )
+        return ChromeTab(conn)
+
+    def close(self):
+        self.browser.close()
+        self._finalizer()
+
+
 class Screenshot:
+
+    SS_WIDTH = 1200
+    SS_HEIGHT = 900
+    PADDING = 5
+
     def __init__(
         self,
         center_df=True,
@@ -83,17 +374,43 @@ class Screenshot:
         fontsize=18,
         encode_base64=True,
         limit_crop=True,
+        sizing="measure",
+        session=None,
+        report_memory=False,
     ):
+        """
+        sizing : 'measure' or 'enlarge', default 'measure'
+            When 'measure', the page is asked for the bounding box of the
+            table and the screenshot is clipped to it in a single capture.
+            When 'enlarge', the window is grown and the screenshot retaken
+            until whitespace surrounds the table, then cropped.
+
+        session : ChromeSession, default None
+            Browser to open a tab in. When None, a browser is launched on
+            first use and shut down by `close`.
+
+        report_memory : bool, default False
+            Print the peak memory used to crop and encode each table when
+            `sizing` is 'enlarge'. Memory is traced with tracemalloc, which
+            is process wide, so only use this with a single worker.
+        """
+        if sizing not in ("measure", "enlarge"):
+            raise ValueError('`sizing` must be either "measure" or "enlarge"')
         self.center_df = center_df
         self.max_rows = max_rows
         self.max_cols = max_cols
-        self.ss_width = 1200
-        self.ss_height = 900
+        self.sizing = sizing
+        self.ss_width = self.SS_WIDTH
+        self.ss_height = self.SS_HEIGHT
         self.chrome_path = get_chrome_path(chrome_path)
         self.css = self.get_css(fontsize)
         self.encode_base64 = encode_base64
         self.limit_crop = limit_crop
         self.enlarge_attempts = 0
+        self.session = session
+        self.owns_session = session is None
+        self.tab = None
+        self.report_memory = report_memory
 
     def get_css(self, fontsize):
         mod_dir = Path(__file__).resolve().parent
@@ -104,37 +421,98 @@ class Screenshot:
         css = css.format(fontsize=fontsize, justify=justify)
         return css
 
+    def get_tab(self):
+        # chrome is launched once and reused for every table
+        if self.tab is None:
+            if self.session is None:
+                self.session = ChromeSession(self.chrome_path)
+            self.tab = self.session.new_tab()
+        return self.tab
+
+    def close(self):
+        if self.tab is not None:
+            self.tab.close()
+            self.tab = None
+        if self.owns_session and self.session is not None:
+            self.session.close()
+            self.session = None
+
     def take_screenshot(self):
-        temp_dir = TemporaryDirectory()
-        temp_html = Path(temp_dir.name) / "temp.html"
-        temp_img = Path(temp_dir.name) / "temp.png"
-        with open(temp_html, "w") as f:
-            f.write(self.html)
-
-        with open(temp_img, "wb") as f:
-            args = ["--enable-logging", "--disable-gpu", "--headless"]
-
-            if self.ss_width and self.ss_height:
-                args.append(f"--window-size={self.ss_width},{self.ss_height}")
-
-            args += [
-                "--hide-scrollbars",
-                f"--screenshot={str(temp_img)}",
-                str(temp_html),
-            ]
+        tab = self.get_tab()
+        tab.set_viewport(self.ss_width, self.ss_height)
+        img = self.decode(tab.screenshot())
+        return self.possibly_enlarge(img)
 
-            subprocess.run(executable=self.chrome_path, args=args)
+    def decode(self, img_bytes):
+        with Image.open(io.BytesIO(img_bytes)) as im:
+            return np.asarray(im.convert("RGB"))
 
-        with open(temp_img, "rb") as f:
-            img_bytes = f.read()
+    def take_measured_screenshot(self):
+        """Returns the png bytes of the table clipped to its bounding box
+        or None when there is nothing visible to measure"""
+        tab = self.get_tab()
+        rect = tab.evaluate(MEASURE_JS % "measure(document.body)")
+        if not rect:
+            return None
+        clip = self.get_clip(rect)
+        self.fit_viewport([clip])
+        return tab.screenshot(clip=clip)
 
-        buffer = io.BytesIO(img_bytes)
-        img = mimage.imread(buffer)
-        return self.possibly_enlarge(img)
+    def get_clip(self, rect):
+        pad = self.PADDING
+        return {
+            "x": max(rect["x"] - pad, 0),
+            "y": max(rect["y"] - pad, 0),
+            "width": rect["width"] + 2 * pad,
+            "height": rect["height"] + 2 * pad,
+        }
+
+    def fit_viewport(self, clips):
+        width = max([self.SS_WIDTH] + [clip["x"] + clip["width"] for clip in clips])
+        height = max([self.SS_HEIGHT] + [clip["y"] + clip["height"] for clip in clips])
+        self.get_tab().set_viewport(width, height)
+
+    def run_batch(self, htmls):
+        """Converts many tables with a single page load
+
+        Every table is placed in its own section of one document. All of
+        their bounding boxes are measured at once and each table is then
+        captured by clipping to its box, so no table is laid out twice.
+        """
+        if self.sizing != "measure":
+            return [self.run(html) for html in htmls]
+
+        sections = [f'<section class="jtm-table">{html}</section>' for html in htmls]
+        # keep the tables apart so that no clip picks up part of its neighbour
+        spacing = (
+            "<style>section.jtm-table {{display: block; margin-bottom: {}px;}}</style>"
+        )
+        self.html = self.css + spacing.format(4 * self.PADDING) + "".join(sections)
+        tab = self.get_tab()
+        tab.set_viewport(self.SS_WIDTH, self.SS_HEIGHT)
+        tab.set_content(self.html)
+        js = (
+            MEASURE_JS
+            % 'Array.from(document.querySelectorAll("section.jtm-table"), measure)'
+        )
+        rects = tab.evaluate(js)
+        clips = [self.get_clip(rect) for rect in rects if rect]
+        self.fit_viewport(clips)
+
+        img_strs = [None] * len(htmls)
+        for i, rect in enumerate(rects):
+            if rect:
+                img_strs[i] = self.encode(tab.screenshot(clip=self.get_clip(rect)))
+
+        # nothing could be measured for these so fall back to lone screenshots
+        for i, html in enumerate(htmls):
+            if img_strs[i] is None:
+                img_strs[i] = self.run(html)
+        return img_strs
 
     def possibly_enlarge(self, img):
         enlarge = False
-        img2d = img.mean(axis=2) == 1
+        img2d = img.min(axis=2) >= 255 - WHITE_TOLERANCE
 
         all_white_vert = img2d.all(axis=0)
         # must be all white for 30 pixels in a row to trigger stop
@@ -166,19 +544,96 @@ class Screenshot:
         diff_horiz = np.diff(all_white_horiz)
         top = diff_horiz.argmax()
         bottom = -diff_horiz[::-1].argmax()
-        new_img = img[top:bottom, left:right]
+        # a view into the screenshot, nothing is copied until encoding
+        new_img = img[top : bottom or None, left : right or None]
         return new_img
 
+    def encode(self, img_bytes):
+        if self.encode_base64:
+            return base64.b64encode(img_bytes).decode()
+        return img_bytes
+
     def finalize_image(self, img):
         buffer = io.BytesIO()
-        mimage.imsave(buffer, img)
-        img_str = buffer.getvalue()
-        if self.encode_base64:
-            img_str = base64.b64encode(img_str).decode()
-        return img_str
+        Image.fromarray(img).save(buffer, format="png")
+        return self.encode(buffer.getvalue())
 
     def run(self, html):
         self.html = self.css + html
+        # every table starts from the default window size
+        self.ss_width = self.SS_WIDTH
+        self.ss_height = self.SS_HEIGHT
+        self.enlarge_attempts = 0
+        self.get_tab().set_content(self.html)
+        if self.sizing == "measure":
+            img_bytes = self.take_measured_screenshot()
+            if img_bytes is not None:
+                return self.encode(img_bytes)
+
+        if self.report_memory:
+            tracemalloc.start()
         img = self.take_screenshot()
         img_str = self.finalize_image(img)
+        if self.report_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            height, width = img.shape[:2]
+            print(
+                f"table screenshot {width}x{height}: peak memory {peak / 2 ** 20:.1f} MB"
+            )
         return img_str
+
+
+class ScreenshotPool:
+    """Renders tables in several tabs of one Chrome at the same time
+
+    Tables given to `run_batch` are dealt out to the tabs, each of which
+    converts its share as a batch on its own thread. The images are
+    returned in the same order as the tables.
+    """
+
+    def __init__(self, workers=None, chrome_path=None, **kwargs):
+        self.workers = get_tab_count(workers)
+        self.chrome_path = get_chrome_path(chrome_path)
+        self.kwargs = kwargs
+        self.session = None
+        self.screenshots = []
+
+    def get_screenshots(self, n):
+        if self.session is None:
+            self.session = ChromeSession(self.chrome_path)
+        # tabs are only opened when there are enough tables to fill them
+        while len(self.screenshots) < min(n, self.workers):
+            ss = Screenshot(
+                chrome_path=self.chrome_path, session=self.session, **self.kwargs
+            )
+            ss.get_tab()
+            self.screenshots.append(ss)
+        return self.screenshots[: max(min(n, self.workers), 1)]
+
+    def run(self, html):
+        return self.get_screenshots(1)[0].run(html)
+
+    def run_batch(self, htmls):
+        screenshots = self.get_screenshots(len(htmls))
+        n = len(screenshots)
+        if n == 1:
+            return screenshots[0].run_batch(htmls)
+
+        img_strs = [None] * len(htmls)
+        with ThreadPoolExecutor(max_workers=n) as executor:
+            futures = [
+                executor.submit(ss.run_batch, htmls[i::n])
+                for i, ss in enumerate(screenshots)
+            ]
+            for i, future in enumerate(futures):
+                img_strs[i::n] = future.result()
+        return img_strs
+
+    def close(self):
+        for ss in self.screenshots:
+            ss.close()
+        self.screenshots = []
+        if self.session is not None:
+            self.session.close()
+            self.session = None
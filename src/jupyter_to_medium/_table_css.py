@@ -0,0 +1,146 @@
+import hashlib
+import re
+
+STYLE_BLOCK = re.compile(r"(<style[^>]*>)(.*?)(</style>)", re.S | re.I)
+CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+CSS_RULE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+ID_ATTR = re.compile(r"""(?<![\w-])id\s*=\s*["']([^"']+)["']""", re.I)
+ID_SELECTOR = re.compile(r"#([\w-]+)")
+SIMPLE_ID_SELECTOR = re.compile(r"^#([\w-]+)$")
+TAG_WITH_ID = re.compile(
+    r"""<([a-zA-Z][\w-]*)(\s[^>]*?(?<![\w-])id\s*=\s*["'][^"']+["'][^>]*)>"""
+)
+CLASS_ATTR = re.compile(r"""(?<![\w-])class\s*=\s*(["'])(.*?)\1""", re.S | re.I)
+TABLE_ID = re.compile(r"""<table\s[^>]*?(?<![\w-])id\s*=\s*["']([\w-]+)["']""", re.I)
+
+
+def parse_rules(css):
+    """
+    Split a flat stylesheet into a list of (selectors, declarations).
+    Returns None for anything with at-rules or nesting, which is left alone.
+
+    Parameters
+    ----------
+    css : str
+        Contents of a <style> element
+    """
+    css = CSS_COMMENT.sub("", css)
+    if "@" in css:
+        return None
+    rules = []
+    for selectors, declarations in CSS_RULE.findall(css):
+        selectors = [sel.strip() for sel in selectors.split(",") if sel.strip()]
+        rules.append((selectors, declarations.strip()))
+    if CSS_RULE.sub("", css).strip():
+        return None
+    return rules
+
+
+def get_properties(declarations):
+    return {
+        decl.split(":")[0].strip().lower()
+        for decl in declarations.split(";")
+        if ":" in decl
+    }
+
+
+def add_classes(html, classes, referenced_ids):
+    """Add the shared classes to the class attribute of each element and
+    drop its id when no remaining selector needs it"""
+
+    def replace(match):
+        tag, attrs = match.groups()
+        id_match = ID_ATTR.search(attrs)
+        if not id_match or id_match.group(1) not in classes:
+            return match.group()
+        new_class = " ".join(classes[id_match.group(1)])
+        if id_match.group(1) not in referenced_ids:
+            attrs = attrs[: id_match.start()] + attrs[id_match.end() :]
+        class_match = CLASS_ATTR.search(attrs)
+        if class_match:
+            new_class = class_match.group(2) + " " + new_class
+            attrs = attrs[: class_match.start()] + attrs[class_match.end() :]
+        return f'<{tag} class="{new_class}"{attrs}>'
+
+    return TAG_WITH_ID.sub(replace, html)
+
+
+def get_class_prefix(html):
+    """Returns a prefix for the classes of one table so that tables
+    rendered on the same page don't share class names. The Styler uuid
+    is used when the table has one."""
+    match = TABLE_ID.search(html)
+    if match:
+        return f"jtm-{match.group(1)}"
+    return "jtm-" + hashlib.sha1(html.encode()).hexdigest()[:8]
+
+
+def strip_unused_css(html):
+    """
+    Shrink the CSS of pandas Styler tables before they are rendered
+
+    Styler writes one id selector per styled cell, which often means
+    thousands of them. Selectors for ids that match no element are dropped.
+    Rules that only target single elements by id are replaced by one short
+    class per distinct set of declarations, unless a more complex rule sets
+    one of the same properties, as the lower specificity of the class could
+    then change which of them wins. The classes are named after the table
+    as several tables can be rendered in the same document.
+
+    Parameters
+    ----------
+    html : str
+        HTML of a table output with its <style> elements
+
+    Returns
+    -------
+    tuple of new html and the number of bytes removed
+    """
+    ids = set(ID_ATTR.findall(html))
+    classes = {}
+    class_names = {}
+    referenced_ids = set()
+    prefix = get_class_prefix(html)
+
+    def shrink_block(match):
+        start, css, end = match.groups()
+        rules = parse_rules(css)
+        if rules is None:
+            return match.group()
+
+        used_rules = []
+        for selectors, declarations in rules:
+            selectors = [
+                sel for sel in selectors if set(ID_SELECTOR.findall(sel)) <= ids
+            ]
+            declarations = " ".join(declarations.split())
+            if selectors and declarations:
+                used_rules.append((selectors, declarations))
+
+        complex_props = set()
+        for selectors, declarations in used_rules:
+            if not all(SIMPLE_ID_SELECTOR.match(sel) for sel in selectors):
+                complex_props |= get_properties(declarations)
+
+        kept_rules = []
+        for selectors, declarations in used_rules:
+            simple = all(SIMPLE_ID_SELECTOR.match(sel) for sel in selectors)
+            if simple and not get_properties(declarations) & complex_props:
+                if declarations not in class_names:
+                    class_names[declarations] = f"{prefix}-s{len(class_names)}"
+                    kept_rules.append(
+                        "." + class_names[declarations] + " {" + declarations + "}"
+                    )
+                for sel in selectors:
+                    classes.setdefault(sel[1:], []).append(class_names[declarations])
+            else:
+                kept_rules.append(", ".join(selectors) + " {" + declarations + "}")
+                for sel in selectors:
+                    referenced_ids.update(ID_SELECTOR.findall(sel))
+        return start + "\n".join(kept_rules) + end
+
+    new_html = STYLE_BLOCK.sub(shrink_block, html)
+    if classes:
+        new_html = add_classes(new_html, classes, referenced_ids)
+    removed = len(html.encode()) - len(new_html.encode())
+    return new_html, removed
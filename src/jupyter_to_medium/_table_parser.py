@@ -0,0 +1,269 @@
+from html.parser import HTMLParser
+import json
+import re
+
+import numpy as np
+
+
+def get_text_align(style):
+    """Returns 'left', 'right' or 'center' from the text-align in an inline
+    style or None when there isn't one"""
+    style = (style or "").lower()
+    if "text-align" in style:
+        idx = style.find("text-align")
+        idx_off = idx + 10
+        text_align = style[idx_off:].split(":")[1].strip()
+        for val in ("left", "right", "center"):
+            if text_align.startswith(val):
+                return val
+
+
+class TableParser(HTMLParser):
+    """
+    Collects the cells of an html table in a single pass without building
+    a tree. Each cell is a list of [text, bold, text_align, rowspan, colspan].
+
+    Rows from the first <thead> are the header and rows from the first
+    <tbody> are the body. When there is neither, every <tr> is a body row.
+    A <thead> without any <tr> is read as a single row. Missing closing
+    </td>, </th> and </tr> tags are inferred.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.head_rows = []
+        self.body_rows = []
+        self.other_rows = []
+        self.section = None
+        self.section_align = None
+        self.num_thead = 0
+        self.num_tbody = 0
+        self.thead_row = None
+        self.row = None
+        self.row_align = None
+        self.cell = None
+        self.text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("td", "th"):
+            self.close_cell()
+            attrs = dict(attrs)
+            if self.row is not None:
+                row_align = self.row_align
+            elif self.section == "thead" and self.num_thead == 1:
+                # cells directly inside the header are its only row
+                if self.thead_row is None:
+                    self.thead_row = []
+                row_align = self.section_align
+            else:
+                return
+            text_align = get_text_align(attrs.get("style")) or row_align
+            rowspan = int(attrs.get("rowspan") or 1)
+            colspan = int(attrs.get("colspan") or 1)
+            self.cell = ["", tag == "th", text_align, rowspan, colspan]
+            self.text = []
+        elif tag == "tr":
+            self.close_row()
+            self.row = []
+            self.row_align = get_text_align(dict(attrs).get("style"))
+        elif tag in ("thead", "tbody"):
+            self.close_row()
+            self.section = tag
+            self.section_align = get_text_align(dict(attrs).get("style"))
+            if tag == "thead":
+                self.num_thead += 1
+            else:
+                self.num_tbody += 1
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th"):
+            self.close_cell()
+        elif tag == "tr":
+            self.close_row()
+        elif tag in ("thead", "tbody", "table"):
+            self.close_row()
+            self.section = None
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.text.append(data)
+
+    def close_cell(self):
+        if self.cell is None:
+            return
+        self.cell[0] = "".join(self.text)
+        if self.row is not None:
+            self.row.append(self.cell)
+        else:
+            self.thead_row.append(self.cell)
+        self.cell = None
+
+    def close_row(self):
+        self.close_cell()
+        if self.row is None:
+            return
+        if self.section == "thead":
+            if self.num_thead == 1:
+                self.head_rows.append(self.row)
+        elif self.section == "tbody":
+            if self.num_tbody == 1:
+                self.body_rows.append(self.row)
+        self.other_rows.append(self.row)
+        self.row = None
+
+    def get_rows(self):
+        self.close_row()
+        if self.num_thead == 0 and self.num_tbody == 0:
+            return self.other_rows, 0
+        head_rows = self.head_rows
+        if self.num_thead and not head_rows:
+            head_rows = [self.thead_row or []]
+        return head_rows + self.body_rows, len(head_rows)
+
+
+def parse_table(html):
+    """
+    Returns the rows of cells of an html table and the number of header rows
+
+    Parameters
+    ----------
+    html : str
+    """
+    parser = TableParser()
+    parser.feed(html)
+    parser.close()
+    return parser.get_rows()
+
+
+TABLE_SCHEMA_MIMETYPE = "application/vnd.dataresource+json"
+NUMERIC_TYPES = {"integer", "number", "datetime", "duration"}
+DEFAULT_INDEX_NAME = re.compile(r"^(index|level_\d+)$")
+
+
+def format_floats(values):
+    """Formats a float column the way pandas displays it, with the same
+    number of decimals (1 to 6) in every row"""
+    values = np.array([np.nan if val is None else val for val in values], dtype=float)
+    finite = values[np.isfinite(values)]
+    nonzero = np.abs(finite[finite != 0])
+    if len(nonzero) and (nonzero.max() >= 1e16 or nonzero.min() < 5e-7):
+        fmt = "{:.6e}"
+    else:
+        rounded = np.round(finite, 6)
+        decimals = next(
+            d for d in range(1, 7) if np.array_equal(np.round(finite, d), rounded)
+        )
+        fmt = f"{{:.{decimals}f}}"
+    return [
+        fmt.format(val) if np.isfinite(val) else ("NaN" if np.isnan(val) else str(val))
+        for val in values
+    ]
+
+
+def format_datetimes(values):
+    """Shows only the date when every value is at midnight, like pandas"""
+    values = [val.replace("T", " ") if val is not None else None for val in values]
+    present = [val for val in values if val is not None]
+    if all(val.endswith(" 00:00:00.000") for val in present):
+        values = [val[:10] if val is not None else None for val in values]
+    elif all(val.endswith(".000") for val in present):
+        values = [val[:-4] if val is not None else None for val in values]
+    return ["NaT" if val is None else val for val in values]
+
+
+def get_missing_text(field):
+    """Returns what pandas shows for a missing value in the column"""
+    ext_dtype = field.get("extDtype")
+    if ext_dtype == "str" or "constraints" in field:
+        # the string dtype of pandas 3 and categoricals
+        return "NaN"
+    elif ext_dtype:
+        return "<NA>"
+    return "None"
+
+
+def format_column(values, field):
+    field_type = field.get("type")
+    if field_type == "number" and not field.get("extDtype"):
+        return format_floats(values)
+    elif field_type == "datetime":
+        return format_datetimes(values)
+    missing = get_missing_text(field)
+    return [missing if val is None else str(val) for val in values]
+
+
+def is_schema_supported(payload):
+    """
+    Returns whether `parse_table_schema` shows the table the way pandas
+    does. Durations and timezone aware datetimes are stored in a form
+    pandas doesn't display, so those tables are rendered from their html.
+
+    Parameters
+    ----------
+    payload : dict or str
+        The application/vnd.dataresource+json output data
+    """
+    if isinstance(payload, str):
+        payload = json.loads(payload)
+    return not any(
+        field.get("type") == "duration" or "tz" in field
+        for field in payload["schema"]["fields"]
+    )
+
+
+def parse_table_schema(payload):
+    """
+    Returns the rows of cells and the number of header rows of a DataFrame
+    from the JSON table schema that pandas stores in notebooks run with
+    the display.html.table_schema option. The cells are the same as
+    those from `parse_table` but numeric columns are right aligned and
+    all others left aligned. Check `is_schema_supported` first.
+
+    Parameters
+    ----------
+    payload : dict or str
+        The application/vnd.dataresource+json output data
+    """
+    if isinstance(payload, str):
+        payload = json.loads(payload)
+    fields = payload["schema"]["fields"]
+    # keys of the data are always strings in JSON, even for integer columns
+    names = [str(field["name"]) for field in fields]
+    index_names = [str(name) for name in payload["schema"].get("primaryKey", [])]
+    data = payload["data"]
+
+    aligns = [
+        "right" if field.get("type") in NUMERIC_TYPES else "left" for field in fields
+    ]
+    bolds = [name in index_names for name in names]
+    cols = [
+        format_column([row.get(name) for row in data], field)
+        for name, field in zip(names, fields)
+    ]
+
+    named_index = any(not DEFAULT_INDEX_NAME.match(name) for name in index_names)
+    header = []
+    index_header = []
+    for name, align, bold in zip(names, aligns, bolds):
+        if bold:
+            header.append(["", True, align, 1, 1])
+            # unnamed levels of a MultiIndex are called level_<n>
+            index_header.append(
+                ["" if DEFAULT_INDEX_NAME.match(name) else name, True, align, 1, 1]
+            )
+        else:
+            header.append([name, True, align, 1, 1])
+            index_header.append(["", True, align, 1, 1])
+
+    rows = [header]
+    if named_index:
+        rows.append(index_header)
+    num_header_rows = len(rows)
+    for texts in zip(*cols):
+        rows.append(
+            [
+                [text, bold, align, 1, 1]
+                for text, bold, align in zip(texts, bolds, aligns)
+            ]
+        )
+    return rows, num_header_rows
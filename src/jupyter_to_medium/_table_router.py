@@ -0,0 +1,164 @@
+import re
+import time
+
+from ._table_css import STYLE_BLOCK, get_properties, parse_rules
+
+TAG = re.compile(r"<([a-zA-Z][\w-]*)")
+CELL = re.compile(r"<t[dh][\s>]", re.I)
+SPAN = re.compile(r"""(?:row|col)span\s*=\s*["']?\s*([0-9]+)""", re.I)
+STYLE_ATTR = re.compile(r"""(?<![\w-])style\s*=\s*(["'])(.*?)\1""", re.S | re.I)
+
+# tags that pandas, the markdown tables and the table image converters
+# all understand, anything else needs a browser to look right
+TABLE_TAGS = {
+    "table",
+    "thead",
+    "tbody",
+    "tfoot",
+    "tr",
+    "th",
+    "td",
+    "br",
+    "div",
+    "p",
+    "style",
+}
+# properties of the default DataFrame css that the image converters follow
+PLAIN_PROPERTIES = {"text-align", "vertical-align"}
+
+
+def inspect_table(html):
+    """
+    Returns the features of an html table that decide how it is converted
+
+    Parameters
+    ----------
+    html : str
+
+    Returns
+    -------
+    dict with the number of cells and whether the table has Styler css,
+    cells spanning several rows or columns and html inside its cells
+    """
+    properties = set()
+    styled = False
+    for _, css, _ in STYLE_BLOCK.findall(html):
+        rules = parse_rules(css)
+        if rules is None:
+            styled = True
+            break
+        for _, declarations in rules:
+            properties |= get_properties(declarations)
+    html_no_css = STYLE_BLOCK.sub("", html)
+    for _, style in STYLE_ATTR.findall(html_no_css):
+        properties |= get_properties(style)
+    styled = styled or bool(properties - PLAIN_PROPERTIES)
+
+    tags = {tag.lower() for tag in TAG.findall(html_no_css)}
+    return {
+        "cells": len(CELL.findall(html_no_css)),
+        "styled": styled,
+        "spans": any(int(span) > 1 for span in SPAN.findall(html_no_css)),
+        "embedded_html": bool(tags - TABLE_TAGS),
+    }
+
+
+class TableRouter:
+    """
+    Sends each table to the fastest converter that renders it faithfully.
+
+    Plain tables are drawn with pillow. Tables with Styler css, cells
+    spanning several rows or columns or html inside their cells are
+    screenshot with chrome, unless they have more than `max_chrome_cells`
+    cells, where the screenshot becomes too slow and too tall and pillow
+    is used anyway. Converters are only created once a table needs them so
+    that chrome is never started for notebooks with plain tables only.
+
+    Each decision is printed with the reason and the time taken.
+
+    Parameters
+    ----------
+    create : callable
+        Returns a new converter when called with 'chrome' or 'pillow'
+
+    max_chrome_cells : int, default 20_000
+        Tables with more cells than this are never sent to chrome
+    """
+
+    def __init__(self, create, max_chrome_cells=20_000):
+        self.create = create
+        self.max_chrome_cells = max_chrome_cells
+        self.converters = {}
+        self.num_tables = 0
+
+    def get_converter(self, engine):
+        if engine not in self.converters:
+            self.converters[engine] = self.create(engine)
+        return self.converters[engine]
+
+    def choose(self, html):
+        """Returns the engine for the table along with the reason for it"""
+        features = inspect_table(html)
+        needs = [
+            name for name in ("styled", "spans", "embedded_html") if features[name]
+        ]
+        cells = features["cells"]
+        if not needs:
+            return "pillow", f"plain, {cells} cells"
+        reason = ", ".join(needs).replace("_", " ")
+        if cells > self.max_chrome_cells:
+            return "pillow", f"{reason} but {cells} cells is too many for chrome"
+        return "chrome", f"{reason}, {cells} cells"
+
+    def run_batch(self, htmls):
+        results = [None] * len(htmls)
+        groups = {"chrome": [], "pillow": []}
+        for i, html in enumerate(htmls):
+            engine, reason = self.choose(html)
+            groups[engine].append((i, reason))
+
+        for i, reason in groups["pillow"]:
+            start = time.perf_counter()
+            results[i] = self.get_converter("pillow").run(htmls[i])
+            self.log(i, "pillow", reason, time.perf_counter() - start)
+
+        if groups["chrome"]:
+            # the screenshots are taken in parallel so only the time of the
+            # whole batch is known
+            start = time.perf_counter()
+            chrome_results = self.get_converter("chrome").run_batch(
+                [htmls[i] for i, _ in groups["chrome"]]
+            )
+            elapsed = time.perf_counter() - start
+            batch = f"batch of {len(chrome_results)}"
+            for (i, reason), result in zip(groups["chrome"], chrome_results):
+                results[i] = result
+                self.log(i, "chrome", f"{reason}, {batch}", elapsed)
+
+        self.num_tables += len(htmls)
+        return results
+
+    def log(self, i, engine, reason, elapsed):
+        print(
+            f"table {self.num_tables + i + 1}: {engine} ({reason}) in {elapsed * 1000:.0f} ms"
+        )
+
+    def run(self, html):
+        return self.run_batch([html])[0]
+
+    def run_table_schema(self, payload):
+        # the table schema only has the values, which pillow draws fine
+        start = time.perf_counter()
+        result = self.get_converter("pillow").run_table_schema(payload)
+        self.num_tables += 1
+        print(
+            f"table {self.num_tables}: pillow (table schema) in {(time.perf_counter() - start) * 1000:.0f} ms"
+        )
+        return result
+
+    def close(self):
+        for converter in self.converters.values():
+            close = getattr(converter, "close", None)
+            if close is not None:
+                close()
+        self.converters = {}
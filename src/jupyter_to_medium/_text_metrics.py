@@ -0,0 +1,114 @@
+from collections import OrderedDict
+
+import numpy as np
+from matplotlib.backends.backend_agg import get_hinting_flag
+from matplotlib.font_manager import FontProperties, findfont, get_font
+
+
+class TextMetrics:
+    """
+    Measures the width of text in pixels without creating any artists.
+
+    Widths are summed from the glyph advances of the font, which are loaded
+    once per font and size into a NumPy array indexed by code point. The
+    width of each string is kept in an LRU cache keyed by
+    (text, fontsize, weight, family) so the repeated passes made while
+    wrapping table columns only measure new strings. Kerning is ignored,
+    so text such as "AV" measures a few percent wider than it is drawn.
+
+    Parameters
+    ----------
+    dpi : int, default 100
+        Resolution of the figure the text will be drawn on
+
+    maxsize : int, default 100_000
+        Number of string widths to keep in the cache
+    """
+
+    def __init__(self, dpi=100, maxsize=100_000):
+        self.dpi = dpi
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.advances = {}
+
+    def get_advances(self, font, fontsize, codes):
+        """Returns the advance table for the font, loading any missing codes"""
+        key = font.fname, fontsize
+        advances = self.advances.get(key)
+        max_code = int(codes.max()) if len(codes) else 0
+        if advances is None or max_code >= len(advances):
+            size = max(256, max_code + 1, 0 if advances is None else len(advances))
+            new_advances = np.full(size, np.nan)
+            if advances is not None:
+                new_advances[: len(advances)] = advances
+            advances = self.advances[key] = new_advances
+
+        missing = np.unique(codes[np.isnan(advances[codes])])
+        if len(missing):
+            font.set_size(fontsize, self.dpi)
+            flags = get_hinting_flag()
+            for code in missing.tolist():
+                glyph = font.load_char(code, flags=flags)
+                advances[code] = glyph.horiAdvance / 64
+        return advances
+
+    def measure_lines(self, lines, fontsize, weight, family):
+        """Returns the widths of single lines of text as an array"""
+        prop = FontProperties(family=family, weight=weight, size=fontsize)
+        font = get_font(findfont(prop))
+        lengths = np.fromiter(
+            (len(line) for line in lines), dtype=np.int64, count=len(lines)
+        )
+        codes = np.frombuffer("".join(lines).encode("utf-32-le"), dtype=np.uint32)
+        advances = self.get_advances(font, fontsize, codes)
+        total = np.zeros(len(codes) + 1)
+        np.cumsum(advances[codes], out=total[1:])
+        ends = np.cumsum(lengths)
+        return total[ends] - total[ends - lengths]
+
+    def widths(self, texts, fontsize, weight="normal", family=None):
+        """
+        Returns the widths in pixels of many strings as an array. Strings
+        containing newlines are as wide as their widest line.
+
+        Parameters
+        ----------
+        texts : list of str
+
+        fontsize : float
+            Size of the text in points
+
+        weight : str, default 'normal'
+            Font weight such as 'normal' or 'bold'
+
+        family : str, default None
+            Font family. Uses the matplotlib default when None
+        """
+        cache = self.cache
+        widths = np.empty(len(texts))
+        missing = {}
+        for i, text in enumerate(texts):
+            key = text, fontsize, weight, family
+            width = cache.get(key)
+            if width is None:
+                missing.setdefault(text, []).append(i)
+            else:
+                cache.move_to_end(key)
+                widths[i] = width
+
+        if missing:
+            new_texts = list(missing)
+            split_texts = [text.split("\n") for text in new_texts]
+            lines = [line for split in split_texts for line in split]
+            line_widths = self.measure_lines(lines, fontsize, weight, family)
+            starts = np.cumsum([0] + [len(split) for split in split_texts[:-1]])
+            new_widths = np.maximum.reduceat(line_widths, starts)
+            for text, width in zip(new_texts, new_widths.tolist()):
+                cache[text, fontsize, weight, family] = width
+                widths[missing[text]] = width
+            while len(cache) > self.maxsize:
+                cache.popitem(last=False)
+        return widths
+
+    def width(self, text, fontsize, weight="normal", family=None):
+        return self.widths([text], fontsize, weight, family)[0]
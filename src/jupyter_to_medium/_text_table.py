@@ -0,0 +1,74 @@
+from ._matplotlib_table import TableMaker
+
+ELLIPSIS = "…"
+
+
+class TextTable(str):
+    """A table rendered as fixed-width text instead of a base64 image"""
+
+    def to_markdown(self):
+        return f"```\n{self}\n```"
+
+
+class TextTableMaker(TableMaker):
+    """
+    Lays out tables as aligned fixed-width text so that they can be placed
+    in code blocks without rendering or uploading any image.
+
+    Parameters
+    ----------
+    max_col_width : int, default 30
+        Cells longer than this many characters are truncated with an
+        ellipsis
+
+    max_width : int, default 80
+        Columns that would make a line longer than this are dropped and
+        replaced by a single column of '...'
+    """
+
+    def __init__(self, max_col_width=30, max_width=80):
+        super().__init__(for_document=False)
+        self.max_col_width = max_col_width
+        self.max_width = max_width
+
+    def truncate(self, text):
+        text = " ".join(text.split())
+        if len(text) > self.max_col_width:
+            text = text[: self.max_col_width - 1] + ELLIPSIS
+        return text
+
+    def render(self, rows, num_header_rows):
+        texts = [[self.truncate(val[0]) for val in row] for row in rows]
+        col_widths = [max(len(row[j]) for row in texts) for j in range(len(texts[0]))]
+
+        # keep the columns that fit, always including the first one and
+        # leaving room for the '...' column when some are dropped
+        truncated = sum(col_widths) + 2 * (len(col_widths) - 1) > self.max_width
+        max_width = self.max_width - 5 if truncated else self.max_width
+        num_cols = 1
+        line_width = col_widths[0]
+        while (
+            num_cols < len(col_widths)
+            and line_width + 2 + col_widths[num_cols] <= max_width
+        ):
+            line_width += 2 + col_widths[num_cols]
+            num_cols += 1
+
+        header_text_align = [vals[2] for vals in rows[0]]
+        lines = []
+        for i, (row, row_texts) in enumerate(zip(rows, texts)):
+            cells = []
+            for j in range(num_cols):
+                ha = row[j][2] or header_text_align[j] or "right"
+                if ha == "left":
+                    cells.append(row_texts[j].ljust(col_widths[j]))
+                elif ha == "center":
+                    cells.append(row_texts[j].center(col_widths[j]))
+                else:
+                    cells.append(row_texts[j].rjust(col_widths[j]))
+            if truncated:
+                cells.append("...")
+            lines.append("  ".join(cells).rstrip())
+            if i == num_header_rows - 1:
+                lines.append("-" * (line_width + (5 if truncated else 0)))
+        return TextTable("\n".join(lines))
@@ -0,0 +1,103 @@
+import base64
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from jupyter_to_medium import _latex
+from jupyter_to_medium._daemon import connect_daemon, recv_message, send_message
+from jupyter_to_medium._latex import draw_latex
+from jupyter_to_medium._render_cache import RenderCache
+
+unix_only = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="needs unix sockets"
+)
+
+
+def make_html(num_rows):
+    body = "".join(f"<tr><th>{i}</th><td>{i * 10}</td></tr>" for i in range(num_rows))
+    return f"<table><thead><tr><th></th><th>a</th></tr></thead><tbody>{body}</tbody></table>"
+
+
+def is_png(img_str):
+    return base64.b64decode(img_str).startswith(b"\x89PNG")
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    from jupyter_to_medium._daemon import RenderServer
+
+    monkeypatch.setattr(_latex, "LATEX_CACHE", RenderCache(tmp_path / "latex"))
+    socket_path = tmp_path / "render.sock"
+    server = RenderServer(socket_path)
+
+    def serve():
+        # closes the socket once shutdown, as main does
+        with server:
+            server.serve_forever()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield connect_daemon(socket_path), thread, socket_path
+    if thread.is_alive():
+        server.shutdown()
+        thread.join()
+
+
+class TestDaemon:
+    def test_imports_without_unix_sockets(self):
+        # what Windows looks like to socketserver and the daemon
+        code = (
+            "import socket; del socket.AF_UNIX\n"
+            "import jupyter_to_medium\n"
+            "from jupyter_to_medium._daemon import connect_daemon\n"
+            "assert connect_daemon() is None\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+    def test_no_daemon(self, tmp_path):
+        assert connect_daemon(tmp_path / "render.sock") is None
+
+    @unix_only
+    def test_framing(self):
+        # larger than one recv so that the message arrives in pieces
+        message = {"htmls": ["x" * 3_000_000, "é"]}
+        left, right = socket.socketpair()
+        with left, right:
+            thread = threading.Thread(target=send_message, args=(left, message))
+            thread.start()
+            assert recv_message(right) == message
+            thread.join()
+
+    @unix_only
+    def test_tables(self, daemon):
+        client, _, _ = daemon
+        converter = client.table_converter("matplotlib", table_page_rows=2)
+        pages, single = converter.run_batch([make_html(5), make_html(1)])
+        assert len(pages) == 3 and all(is_png(page) for page in pages)
+        assert is_png(single)
+        assert is_png(client.table_converter("pillow").run(make_html(3)))
+
+    @unix_only
+    def test_latex(self, daemon):
+        client, _, _ = daemon
+        assert client.render_latex("x^2") == draw_latex("x^2")
+
+    @unix_only
+    def test_error_reply(self, daemon):
+        client, _, _ = daemon
+        with pytest.raises(ValueError, match="Unknown request kind"):
+            client.request(kind="unknown")
+        # the daemon keeps serving after a failed request
+        assert client.request(kind="ping") == {}
+
+    @unix_only
+    def test_shutdown(self, daemon):
+        client, thread, socket_path = daemon
+        assert client.request(kind="shutdown") == {}
+        thread.join(timeout=10)
+        assert not thread.is_alive()
+        assert not socket_path.exists()
+        assert connect_daemon(socket_path) is None
@@ -0,0 +1,42 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from jupyter_to_medium._http import HttpClient
+
+
+@pytest.fixture
+def server():
+    statuses = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(statuses.pop(0) if statuses else 200)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+
+        do_POST = do_GET
+
+    httpd = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}/", statuses
+    httpd.shutdown()
+
+
+class TestHttpClient:
+    def test_retries_server_errors(self, server):
+        url, statuses = server
+        statuses.extend([503, 429])
+        client = HttpClient(backoff=0.001)
+        assert client.get(url).status_code == 200
+        assert client.stats[url[7:-1]]["retries"] == 2
+
+    def test_does_not_retry_post_after_server_error(self, server):
+        url, statuses = server
+        statuses.extend([503])
+        client = HttpClient(backoff=0.001)
+        assert client.post(url, idempotent=False).status_code == 503
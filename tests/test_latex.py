@@ -0,0 +1,49 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageFilter
+
+from jupyter_to_medium._latex import draw_latex_figure, format_latex, rasterize_latex
+
+FORMULAS = {
+    "superscript": "x^2",
+    "fraction": r"\frac{a}{b} + \sqrt{x}",
+    "sum": r"\sum_{i=0}^{n} x_i^2",
+    "align": format_latex(
+        "$$\n\\begin{align}\na &= b + c \\\\\nd &= e\n\\end{align}\n$$"
+    ),
+    "lines": format_latex("$$\nx = 1\\\\\ny^2 = \\frac{1}{2}\n$$"),
+}
+
+
+def get_ink(image, size):
+    """Returns where the image is mostly opaque, on a canvas of the given
+    size with the image in the bottom left corner where text starts"""
+    canvas = Image.new("L", size)
+    canvas.paste(image.getchannel("A"), (0, size[1] - image.height))
+    return canvas
+
+
+def get_coverage(image, other, distance=2):
+    """Returns the fraction of the ink of the image that is within
+    `distance` pixels of the ink of the other image"""
+    size = max(image.width, other.width), max(image.height, other.height)
+    ink = np.asarray(get_ink(image, size)) >= 128
+    near = get_ink(other, size).filter(ImageFilter.MaxFilter(2 * distance + 1))
+    return (ink & (np.asarray(near) >= 128)).sum() / ink.sum()
+
+
+class TestRasterizeLatex:
+    @pytest.mark.parametrize("fontsize", [10, 22])
+    @pytest.mark.parametrize("formula", FORMULAS.values(), ids=list(FORMULAS))
+    def test_same_as_figure(self, formula, fontsize):
+        image = Image.open(io.BytesIO(rasterize_latex(formula, fontsize)))
+        expected = Image.open(io.BytesIO(draw_latex_figure(formula, fontsize)))
+        assert image.mode == "RGBA"
+        assert abs(image.width - expected.width) <= 2
+        assert abs(image.height - expected.height) <= 2
+        # glyphs can land a pixel apart as the figure places the lines at
+        # fractional positions on older matplotlib versions
+        assert get_coverage(image, expected) > 0.98
+        assert get_coverage(expected, image) > 0.98
@@ -0,0 +1,95 @@
+import base64
+
+from jupyter_to_medium._matplotlib_table import TableMaker
+from jupyter_to_medium._preprocesors import replace_md_tables, store_table_image
+
+
+def make_html(num_rows):
+    body = "".join(f"<tr><th>{i}</th><td>{i * 10}</td></tr>" for i in range(num_rows))
+    return f"<table><thead><tr><th></th><th>a</th></tr></thead><tbody>{body}</tbody></table>"
+
+
+class TestGetPages:
+    def make_maker(self, row_heights, num_header_rows=1, **kwargs):
+        maker = TableMaker(**kwargs)
+        maker.rows = [None] * len(row_heights)
+        maker.num_header_rows = num_header_rows
+        maker.row_heights = row_heights
+        return maker
+
+    def test_max_page_rows(self):
+        maker = self.make_maker([0.3] * 6, max_page_rows=2)
+        # the header row starts every page
+        assert maker.get_pages() == [[0, 1, 2], [0, 3, 4], [0, 5]]
+
+    def test_max_page_height(self):
+        # rows of 30 pixels under a header of 60
+        maker = self.make_maker(
+            [0.3, 0.3] + [0.3] * 5, num_header_rows=2, max_page_height=150
+        )
+        assert maker.get_pages() == [[0, 1, 2, 3, 4], [0, 1, 5, 6]]
+
+    def test_one_page(self):
+        assert self.make_maker([0.3] * 3).get_pages() == [[0, 1, 2]]
+        assert self.make_maker([0.3]).get_pages() == [[0]]
+
+    def test_run_returns_pages(self):
+        pages = TableMaker(max_page_rows=2).run(make_html(5))
+        assert len(pages) == 3
+        assert all(base64.b64decode(page).startswith(b"\x89PNG") for page in pages)
+        assert isinstance(TableMaker().run(make_html(5)), str)
+
+
+class TestStorePages:
+    def test_dataframe_output(self):
+        output = {
+            "output_type": "execute_result",
+            "data": {"text/html": "<table></table>"},
+        }
+        after = {"output_type": "stream", "text": "done"}
+        outputs = [output, after]
+        store_table_image(outputs, output, ["page0", "page1", "page2"])
+        assert output["data"] == {"image/png": "page0"}
+        assert [out["output_type"] for out in outputs] == [
+            "execute_result",
+            "display_data",
+            "display_data",
+            "stream",
+        ]
+        assert [out["data"]["image/png"] for out in outputs[1:3]] == ["page1", "page2"]
+
+    def test_markdown_table(self):
+        cell = {"source": "| a | b |\n|---|---|\n| 1 | 2 |\n\nAfter"}
+        image_data_dict = {}
+        pages = [base64.b64encode(b"one").decode(), base64.b64encode(b"two").decode()]
+        replace_md_tables(image_data_dict, cell, lambda html: pages, 3)
+        assert image_data_dict == {
+            "markdown_3_table_0_page_0.png": b"one",
+            "markdown_3_table_0_page_1.png": b"two",
+        }
+        assert (
+            cell["source"]
+            == "![](markdown_3_table_0_page_0.png)\n\n![](markdown_3_table_0_page_1.png)\nAfter"
+        )
+
+
+class TestFontSize:
+    def test_wide_table_without_wrappable_text(self):
+        # numbers too short to wrap, too wide for the figure at 18pt
+        header = [["", True, None, 1, 1]] + [
+            [f"c{j}", True, None, 1, 1] for j in range(14)
+        ]
+        body = [
+            [[str(i), True, None, 1, 1]]
+            + [[f"{12345.678 * (i + 1) + j:.3f}", False, None, 1, 1] for j in range(14)]
+            for i in range(5)
+        ]
+        maker = TableMaker(fontsize=18)
+        maker.rows, maker.num_header_rows = [header] + body, 1
+        maker.fontsize = 18
+        maker.calculate_col_widths()
+        # the largest font size at which the numbers fit, within the
+        # precision of the search, rather than the minimum
+        assert maker.min_fontsize < maker.fontsize < 18
+        assert maker.fit_columns(maker.fontsize)[2]
+        assert not maker.fit_columns(maker.fontsize + 0.5)[2]
@@ -0,0 +1,68 @@
+import io
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+from jupyter_to_medium._optimize_gif import drop_frames, optimize_gif
+
+
+def make_gif():
+    rng = np.random.default_rng(0)
+    # a noisy background of 200 colors with a square moving across it
+    colors = rng.integers(0, 256, size=(200, 3), dtype=np.uint8)
+    background = colors[rng.integers(0, 200, size=(60, 80))]
+    frames = []
+    for i in range(6):
+        frame = background.copy()
+        x = 10 * min(i, 4)
+        frame[20:30, x : x + 10] = colors[0]
+        frames.append(Image.fromarray(frame))
+    buffer = io.BytesIO()
+    frames[0].save(
+        buffer,
+        format="gif",
+        save_all=True,
+        append_images=frames[1:],
+        duration=[100, 100, 200, 100, 100, 300],
+        loop=0,
+    )
+    return buffer.getvalue()
+
+
+def decode(data):
+    image = Image.open(io.BytesIO(data))
+    frames = [
+        np.asarray(frame.convert("RGB")) for frame in ImageSequence.Iterator(image)
+    ]
+    durations = [frame.info["duration"] for frame in ImageSequence.Iterator(image)]
+    return frames, durations
+
+
+class TestOptimizeGif:
+    def test_frames_match(self):
+        data = make_gif()
+        new_data = optimize_gif(data)
+        assert new_data is not None and len(new_data) < len(data)
+        frames, durations = decode(data)
+        new_frames, new_durations = decode(new_data)
+        # pillow already merged the last two frames when writing the gif
+        assert len(new_frames) == len(frames) == 5
+        assert new_durations == durations == [100, 100, 200, 100, 400]
+        for frame, new_frame in zip(frames, new_frames):
+            assert np.array_equal(frame, new_frame)
+        assert Image.open(io.BytesIO(new_data)).info["loop"] == 0
+
+    def test_max_fps(self):
+        new_frames, new_durations = decode(optimize_gif(make_gif(), max_fps=5))
+        assert new_durations == [200, 200, 500]
+        assert len(new_frames) == 3
+
+    def test_drop_frames(self):
+        frames = [np.zeros((2, 2)), np.zeros((2, 2)), np.ones((2, 2))]
+        kept = list(drop_frames(iter(zip(frames, [100, 50, 100]))))
+        assert [duration for _, duration in kept] == [150, 100]
+
+    def test_not_animated(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (10, 10)).save(buffer, format="gif")
+        assert optimize_gif(buffer.getvalue()) is None
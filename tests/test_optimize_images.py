@@ -0,0 +1,80 @@
+import io
+
+import numpy as np
+from PIL import Image, ImageCms
+
+from jupyter_to_medium._optimize_images import optimize_image, optimize_images
+
+
+def encode(image, format_, **kwargs):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format_, **kwargs)
+    return buffer.getvalue()
+
+
+def make_photo(width=300, height=200):
+    # smooth gradients with a little noise, which only JPEG compresses well
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    rgb = np.stack(
+        [x * 255 / width, y * 255 / height, (x + y) * 127 / (width + height)], axis=-1
+    )
+    rgb += rng.normal(0, 4, rgb.shape)
+    return Image.fromarray(np.clip(rgb, 0, 255).astype(np.uint8))
+
+
+def make_table(width=600, height=300):
+    # flat colors like a rendered table
+    image = Image.new("RGB", (width, height), "white")
+    for i in range(0, height, 30):
+        image.paste(
+            (230, 230, 230) if i % 60 else (200, 220, 255), (0, i, width, i + 15)
+        )
+    return image
+
+
+class TestOptimizeImage:
+    def test_photo_becomes_jpeg(self):
+        data = encode(make_photo(), "png")
+        new_data, extension = optimize_image(data)
+        assert extension == "jpeg"
+        assert len(new_data) < len(data)
+
+    def test_flat_image_stays_png(self):
+        data = encode(make_table(), "png")
+        new_data, extension = optimize_image(data)
+        assert extension == "png"
+        assert Image.open(io.BytesIO(new_data)).size == (600, 300)
+
+    def test_downscale(self):
+        data = encode(make_photo(), "png")
+        new_data, _ = optimize_image(data, max_width=150)
+        assert Image.open(io.BytesIO(new_data)).size == (150, 100)
+
+    def test_not_smaller(self):
+        data = encode(Image.new("RGB", (10, 10), "white"), "png", optimize=True)
+        assert optimize_image(data) is None
+
+    def test_orientation_and_icc_profile_kept(self):
+        exif = Image.Exif()
+        # rotated 90 degrees clockwise for display
+        exif[0x0112] = 6
+        icc_profile = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+        data = encode(
+            make_photo(), "jpeg", quality=100, exif=exif, icc_profile=icc_profile
+        )
+        new_data, _ = optimize_image(data)
+        image = Image.open(io.BytesIO(new_data))
+        assert image.size == (200, 300)
+        assert image.getexif().get(0x0112, 1) == 1
+        assert image.info["icc_profile"] == icc_profile
+
+
+class TestOptimizeImages:
+    def test_renames_converted_images(self):
+        photo = encode(make_photo(), "png")
+        image_data_dict = {"photo.png": photo, "notes.txt": b"text"}
+        new_image_data_dict, renamed = optimize_images(image_data_dict, workers=1)
+        assert renamed == {"photo.png": "photo.jpeg"}
+        assert list(new_image_data_dict) == ["photo.jpeg", "notes.txt"]
+        assert new_image_data_dict["notes.txt"] == b"text"
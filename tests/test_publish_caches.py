@@ -0,0 +1,141 @@
+import time
+
+import pytest
+
+from jupyter_to_medium import _publish_to_medium
+from jupyter_to_medium._publish_to_medium import Publish
+from jupyter_to_medium._render_cache import RenderCache
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+        self.text = str(data)
+
+    def json(self):
+        return self.data
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+        self.post_status = 201
+
+    def get(self, url, **kwargs):
+        self.calls.append(url)
+        if url.endswith("/me"):
+            return FakeResponse({"data": {"id": "author"}})
+        return FakeResponse(
+            {"data": [{"name": "Other", "id": "other"}, {"name": "Pub", "id": "pub"}]}
+        )
+
+    def post(self, url, **kwargs):
+        self.calls.append(url)
+        if "files" in kwargs:
+            name = kwargs["files"]["image"][0]
+            return FakeResponse({"data": {"url": f"https://cdn/{name}"}})
+        if self.post_status >= 400:
+            return FakeResponse(
+                {"errors": [{"message": "Token was invalid.", "code": 6003}]},
+                self.post_status,
+            )
+        return FakeResponse(
+            {"data": {"url": "https://medium.com/post"}}, self.post_status
+        )
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(_publish_to_medium, "HTTP_CLIENT", client)
+    monkeypatch.setattr(
+        _publish_to_medium,
+        "UPLOAD_CACHE",
+        RenderCache(tmp_path / "images", memo_size=0),
+    )
+    monkeypatch.setattr(
+        _publish_to_medium,
+        "ACCOUNT_CACHE",
+        RenderCache(tmp_path / "accounts", memo_size=0),
+    )
+    return client
+
+
+def make_publish(pub_name="Pub", token="token"):
+    publish = Publish.__new__(Publish)
+    publish.integration_token = token
+    publish.headers = {}
+    publish.pub_name = pub_name
+    publish.upload_workers = 2
+    publish.title = "title"
+    publish.md = ""
+    publish.license = "all-rights-reserved"
+    publish.publish_status = "draft"
+    publish.notify_followers = False
+    publish.canonical_url = None
+    publish.tags = None
+    return publish
+
+
+class TestUploadCache:
+    def test_duplicates_and_earlier_uploads(self, client):
+        publish = make_publish()
+        publish.image_data_dict = {
+            "a.png": b"one",
+            "b.png": b"one",
+            "c.png": b"two",
+            "d.txt": b"one",
+        }
+        publish.md = "![](a.png) ![](b.png) ![](c.png)"
+        publish.load_images_to_medium()
+        # the same bytes are uploaded once
+        assert len(client.calls) == 2
+        assert publish.md == "![](https://cdn/a) ![](https://cdn/a) ![](https://cdn/c)"
+
+        publish = make_publish()
+        publish.image_data_dict = {"e.png": b"two"}
+        publish.md = "![](e.png)"
+        publish.load_images_to_medium()
+        assert len(client.calls) == 2
+        assert publish.md == "![](https://cdn/c)"
+
+
+class TestAccountCache:
+    def test_ids_are_cached_per_token(self, client):
+        assert make_publish().get_ids() == ("author", "pub")
+        assert len(client.calls) == 2
+        assert make_publish().get_ids() == ("author", "pub")
+        assert len(client.calls) == 2
+        # a new publication only needs the publications list
+        assert make_publish(pub_name="Other").get_ids() == ("author", "other")
+        assert len(client.calls) == 3
+        make_publish(token="other token").get_ids()
+        assert len(client.calls) == 5
+
+    def test_expires(self, client, monkeypatch):
+        make_publish().get_ids()
+        now = time.time()
+        monkeypatch.setattr(
+            _publish_to_medium.time,
+            "time",
+            lambda: now + _publish_to_medium.ACCOUNT_TTL + 1,
+        )
+        make_publish().get_ids()
+        assert len(client.calls) == 4
+
+    @pytest.mark.parametrize("status", [401, 403])
+    def test_invalidated_by_auth_errors(self, client, status):
+        publish = make_publish()
+        publish.get_ids()
+        client.post_status = status
+        publish.publish_to_medium()
+        make_publish().get_ids()
+        assert client.calls.count(publish.AUTHOR_URL) == 2
+
+    def test_kept_after_post(self, client):
+        publish = make_publish()
+        publish.get_ids()
+        publish.publish_to_medium()
+        make_publish().get_ids()
+        assert client.calls.count(publish.AUTHOR_URL) == 1
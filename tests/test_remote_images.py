@@ -0,0 +1,101 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from jupyter_to_medium import _remote_images
+from jupyter_to_medium._remote_images import RemoteImageFetcher, is_linked
+from jupyter_to_medium._render_cache import RenderCache
+
+
+@pytest.fixture
+def server():
+    state = {"requests": [], "headers": {"ETag": '"v1"'}, "status": 200}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            state["requests"].append(dict(self.headers))
+            if state["status"] != 200:
+                self.send_response(state["status"])
+                self.end_headers()
+                return
+            etag = state["headers"].get("ETag")
+            last_modified = state["headers"].get("Last-Modified")
+            if (etag and self.headers.get("If-None-Match") == etag) or (
+                last_modified and self.headers.get("If-Modified-Since") == last_modified
+            ):
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            for name, value in state["headers"].items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", "5")
+            self.end_headers()
+            self.wfile.write(b"image")
+
+    httpd = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}/image.png", state
+    httpd.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def http_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        _remote_images, "HTTP_CACHE", RenderCache(tmp_path, memo_size=0)
+    )
+
+
+def fetch(url):
+    results = []
+    fetcher = RemoteImageFetcher()
+    fetcher(url, results.append)
+    fetcher(url, results.append)
+    fetcher.flush()
+    return results
+
+
+class TestRemoteImageFetcher:
+    def test_revalidates_with_etag(self, server):
+        url, state = server
+        assert fetch(url) == [b"image", b"image"]
+        # the same url is only downloaded once per flush
+        assert len(state["requests"]) == 1
+        assert fetch(url) == [b"image", b"image"]
+        assert state["requests"][1]["If-None-Match"] == '"v1"'
+
+    def test_revalidates_with_last_modified(self, server):
+        url, state = server
+        state["headers"] = {"Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"}
+        fetch(url)
+        assert fetch(url) == [b"image", b"image"]
+        assert (
+            state["requests"][1]["If-Modified-Since"] == "Wed, 21 Oct 2015 07:28:00 GMT"
+        )
+
+    def test_fresh_image_is_not_requested(self, server):
+        url, state = server
+        state["headers"] = {"Cache-Control": "max-age=3600"}
+        fetch(url)
+        assert fetch(url) == [b"image", b"image"]
+        assert len(state["requests"]) == 1
+
+    def test_stale_image_used_when_request_fails(self, server):
+        url, state = server
+        fetch(url)
+        state["status"] = 404
+        assert fetch(url) == [b"image", b"image"]
+        assert len(state["requests"]) == 2
+
+
+class TestIsLinked:
+    def test_hosts(self):
+        assert is_linked("https://i.imgur.com/a.png", True)
+        assert is_linked("https://i.imgur.com/a.png", ["imgur.com"])
+        assert not is_linked("https://notimgur.com/a.png", ["imgur.com"])
+        assert not is_linked("images/a.png", True)
+        assert not is_linked("https://i.imgur.com/a.png", False)
@@ -0,0 +1,38 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from jupyter_to_medium._render_cache import RenderCache
+
+
+class TestRenderCache:
+    def test_get_or_render(self, tmp_path):
+        cache = RenderCache(tmp_path)
+        key = cache.make_key("latex", "x^2", 10)
+        assert cache.get_or_render(key, lambda: b"image") == b"image"
+        # a new process reads the file instead of rendering
+        cache = RenderCache(tmp_path)
+        assert cache.get_or_render(key, lambda: b"other") == b"image"
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = RenderCache(tmp_path, max_bytes=250, memo_size=0)
+        for i in range(3):
+            cache.put(str(i), b"x" * 100)
+            os.utime(tmp_path / str(i), (i, i))
+        assert sorted(os.listdir(tmp_path)) == ["1", "2"]
+        # reading "1" makes "2" the oldest
+        cache.get("1")
+        cache.put("3", b"x" * 100)
+        assert sorted(os.listdir(tmp_path)) == ["1", "3"]
+
+    def test_threads(self, tmp_path):
+        cache = RenderCache(tmp_path, max_bytes=2_000, memo_size=8)
+
+        def work(i):
+            for j in range(50):
+                cache.put(f"{i}-{j}", b"x" * 100)
+                cache.get(f"{i}-{j // 2}")
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(work, range(8)))
+        assert cache.size == sum(entry.stat().st_size for entry in os.scandir(tmp_path))
+        assert cache.size <= 2_000
@@ -0,0 +1,59 @@
+import re
+
+from jupyter_to_medium._table_css import strip_unused_css
+
+
+def styled_table(uuid, color):
+    return (
+        '<style type="text/css">\n'
+        f"#T_{uuid}_row0_col0, #T_{uuid}_row1_col0 {{\n  background-color: {color};\n}}\n"
+        "</style>\n"
+        f'<table id="T_{uuid}">\n  <tbody>\n'
+        f'    <tr><td id="T_{uuid}_row0_col0" class="data row0 col0">1</td></tr>\n'
+        f'    <tr><td id="T_{uuid}_row1_col0" class="data row1 col0">2</td></tr>\n'
+        f'    <tr><td id="T_{uuid}_row2_col0" class="data row2 col0">3</td></tr>\n'
+        "  </tbody>\n</table>"
+    )
+
+
+def get_cell_classes(html):
+    return re.findall(r'<td class="([^"]*)"', html)
+
+
+class TestStripUnusedCss:
+    def test_replaces_id_rules_with_classes(self):
+        html, removed = strip_unused_css(styled_table("abc", "red"))
+        assert removed > 0
+        assert "#T_abc_row0_col0" not in html
+        assert ".jtm-T_abc-s0 {background-color: red;}" in html
+        assert get_cell_classes(html) == [
+            "data row0 col0 jtm-T_abc-s0",
+            "data row1 col0 jtm-T_abc-s0",
+        ]
+
+    def test_tables_on_one_page_do_not_share_classes(self):
+        red, _ = strip_unused_css(styled_table("abc", "red"))
+        blue, _ = strip_unused_css(styled_table("def", "blue"))
+        red_classes = set(" ".join(get_cell_classes(red)).split()) - {
+            "data",
+            "row0",
+            "row1",
+            "col0",
+        }
+        blue_classes = set(" ".join(get_cell_classes(blue)).split()) - {
+            "data",
+            "row0",
+            "row1",
+            "col0",
+        }
+        assert red_classes and blue_classes
+        assert not red_classes & blue_classes
+
+    def test_tables_without_id(self):
+        first, _ = strip_unused_css(
+            styled_table("abc", "red").replace(' id="T_abc"', "")
+        )
+        second, _ = strip_unused_css(
+            styled_table("abc", "blue").replace(' id="T_abc"', "")
+        )
+        assert get_cell_classes(first) != get_cell_classes(second)
@@ -0,0 +1,191 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from jupyter_to_medium._table_parser import (
+    is_schema_supported,
+    parse_table,
+    parse_table_schema,
+)
+
+
+TABLES = Path(__file__).parent / "tables"
+NOTEBOOK = Path(__file__).parent.parent / "Jupyter to Medium Initial Post.ipynb"
+# tables that html parsers tend to read differently
+EDGE_CASES = {
+    "spans_and_align": (
+        "<table><thead><tr><th colspan='2' style='TEXT-ALIGN: Center'>a</th></tr></thead>"
+        "<tbody><tr><th rowspan=\"2\">i</th><td style='text-align:left'>1<em>2</em></td></tr>"
+        "<tr><td>3</td></tr></tbody></table>"
+    ),
+    "no_sections": "<table><tr><th>a</th><td>b<!-- c --></td></tr><tr><td>1<td>&nbsp;</tr></table>",
+    "thead_without_tr": (
+        "<table><thead style='text-align:left'><th>a</th></thead>"
+        "<tbody><tr><td>1 &amp; 2</td></tr></tbody></table>"
+    ),
+    "implied_end_tags": "<table><thead><tr><th>a<th>b<tbody><tr><td>1<td>2<tr><td>3<td>4</table>",
+    "two_tables": (
+        "<table><thead><tr><th>a</th></tr></thead><tbody><tr><td>a</td></tr></tbody></table>"
+        "<table><thead><tr><th>b</th></tr></thead><tbody><tr><td>b</td></tr></tbody></table>"
+    ),
+}
+
+
+def get_corpus():
+    """The DataFrame, MultiIndex, Styler and markdown tables in tests/tables,
+    the tables of the example notebook and the edge cases"""
+    tables = {path.stem: path.read_text() for path in sorted(TABLES.glob("*.html"))}
+    for i, cell in enumerate(json.loads(NOTEBOOK.read_text())["cells"]):
+        for j, output in enumerate(cell.get("outputs", [])):
+            html = "".join(output.get("data", {}).get("text/html", ""))
+            if "<table" in html:
+                tables[f"notebook_{i}_{j}"] = html
+    tables.update(EDGE_CASES)
+    return tables
+
+
+CORPUS = get_corpus()
+
+
+def get_text_align(element):
+    style = element.get("style", "").lower()
+    if "text-align" in style:
+        idx = style.find("text-align")
+        text_align = style[idx + 10 :].split(":")[1].strip()
+        for val in ("left", "right", "center"):
+            if text_align.startswith(val):
+                return val
+
+
+def parse_table_with_soup(html):
+    """The BeautifulSoup parser that parse_table replaced"""
+    bs4 = pytest.importorskip("bs4")
+    try:
+        import lxml  # noqa: F401
+
+        features = "lxml"
+    except ImportError:
+        features = "html.parser"
+
+    def parse_row(row):
+        row_align = get_text_align(row)
+        return [
+            [
+                el.get_text(),
+                el.name == "th",
+                get_text_align(el) or row_align,
+                int(el.attrs.get("rowspan", 1)),
+                int(el.attrs.get("colspan", 1)),
+            ]
+            for el in row.find_all(["td", "th"])
+        ]
+
+    soup = bs4.BeautifulSoup(html, features=features)
+    thead = soup.find("thead")
+    tbody = soup.find("tbody")
+    rows = []
+    if thead:
+        head_rows = thead.find_all("tr") or [thead]
+        rows.extend(parse_row(row) for row in head_rows)
+    num_header_rows = len(rows)
+    if tbody:
+        rows.extend(parse_row(row) for row in tbody.find_all("tr"))
+    if not thead and not tbody:
+        rows.extend(parse_row(row) for row in soup.find_all("tr"))
+    return rows, num_header_rows
+
+
+class TestTableParser:
+    @pytest.mark.parametrize("html", CORPUS.values(), ids=list(CORPUS))
+    def test_same_as_soup(self, html):
+        assert parse_table(html) == parse_table_with_soup(html)
+
+
+def get_texts(rows):
+    return [[cell[0] for cell in row] for row in rows]
+
+
+class TestParseTableSchema:
+    def test_dataframe(self):
+        payload = {
+            "schema": {
+                "fields": [
+                    {"name": "index", "type": "integer"},
+                    {"name": "f", "type": "number"},
+                    {"name": "t", "type": "datetime"},
+                    {"name": "o", "type": "string"},
+                    {"name": "i", "type": "integer", "extDtype": "Int64"},
+                    {
+                        "name": "c",
+                        "type": "any",
+                        "constraints": {"enum": ["x"]},
+                        "ordered": False,
+                    },
+                ],
+                "primaryKey": ["index"],
+            },
+            "data": [
+                {
+                    "index": 0,
+                    "f": 1.5,
+                    "t": "2020-01-01T10:00:00.000",
+                    "o": "a",
+                    "i": 1,
+                    "c": "x",
+                },
+                {"index": 1, "f": 2, "t": None, "o": None, "i": None, "c": None},
+            ],
+        }
+        rows, num_header_rows = parse_table_schema(payload)
+        assert num_header_rows == 1
+        assert get_texts(rows) == [
+            ["", "f", "t", "o", "i", "c"],
+            ["0", "1.5", "2020-01-01 10:00:00", "a", "1", "x"],
+            ["1", "2.0", "NaT", "None", "<NA>", "NaN"],
+        ]
+        assert [cell[2] for cell in rows[1]] == [
+            "right",
+            "right",
+            "right",
+            "left",
+            "right",
+            "left",
+        ]
+        assert [cell[1] for cell in rows[1]] == [
+            True,
+            False,
+            False,
+            False,
+            False,
+            False,
+        ]
+
+    def test_unnamed_multiindex_level(self):
+        payload = {
+            "schema": {
+                "fields": [
+                    {"name": "k", "type": "string"},
+                    {"name": "level_1", "type": "integer"},
+                    {"name": "a", "type": "integer"},
+                ],
+                "primaryKey": ["k", "level_1"],
+            },
+            "data": [{"k": "x", "level_1": 1, "a": 2}],
+        }
+        rows, num_header_rows = parse_table_schema(payload)
+        assert num_header_rows == 2
+        assert get_texts(rows) == [["", "", "a"], ["k", "", ""], ["x", "1", "2"]]
+
+    def test_unsupported_types(self):
+        def make_payload(field):
+            return {
+                "schema": {"fields": [{"name": "index", "type": "integer"}, field]},
+                "data": [],
+            }
+
+        assert is_schema_supported(make_payload({"name": "a", "type": "datetime"}))
+        assert not is_schema_supported(
+            make_payload({"name": "a", "type": "datetime", "tz": "UTC"})
+        )
+        assert not is_schema_supported(make_payload({"name": "a", "type": "duration"}))
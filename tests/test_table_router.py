@@ -0,0 +1,50 @@
+from jupyter_to_medium._table_router import TableRouter, inspect_table
+
+PLAIN = (
+    "<div><style scoped>\n    .dataframe tbody tr th {\n        vertical-align: top;\n    }\n"
+    "    .dataframe thead th {\n        text-align: right;\n    }\n</style>\n"
+    '<table border="1" class="dataframe">\n  <thead>\n'
+    '    <tr style="text-align: right;">\n      <th></th>\n      <th>a</th>\n    </tr>\n'
+    "  </thead>\n  <tbody>\n"
+    "    <tr>\n      <th>0</th>\n      <td>1</td>\n    </tr>\n"
+    "  </tbody>\n</table>\n<p>1 rows × 1 columns</p></div>"
+)
+STYLED = PLAIN.replace("vertical-align: top;", "background-color: #f00;")
+SPANS = PLAIN.replace("<th>0</th>", '<th rowspan="2">0</th>')
+EMBEDDED = PLAIN.replace("<td>1</td>", '<td><a href="x">1</a></td>')
+
+
+class FakeConverter:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def run(self, html):
+        return self.engine
+
+    def run_batch(self, htmls):
+        return [self.engine] * len(htmls)
+
+
+class TestTableRouter:
+    def test_inspect_table(self):
+        assert inspect_table(PLAIN) == {
+            "cells": 4,
+            "styled": False,
+            "spans": False,
+            "embedded_html": False,
+        }
+        assert inspect_table(STYLED)["styled"]
+        assert inspect_table(SPANS)["spans"]
+        assert inspect_table(EMBEDDED)["embedded_html"]
+
+    def test_routing_keeps_order(self):
+        router = TableRouter(FakeConverter, max_chrome_cells=10)
+        huge_styled = STYLED.replace("<td>1</td>", "<td>1</td>" * 20)
+        results = router.run_batch([STYLED, PLAIN, SPANS, huge_styled, EMBEDDED])
+        assert results == ["chrome", "pillow", "chrome", "pillow", "chrome"]
+        assert set(router.converters) == {"chrome", "pillow"}
+
+    def test_chrome_is_created_lazily(self):
+        router = TableRouter(FakeConverter)
+        router.run(PLAIN)
+        assert list(router.converters) == ["pillow"]
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from jupyter_to_medium._text_metrics import TextMetrics
+
+TEXTS = [
+    "Wide AVATAR text",
+    "WAVY Tokyo",
+    "12345.678",
+    "hello world",
+    "MMMMMMMM",
+    "a",
+    "café → crème",
+]
+
+
+@pytest.fixture(scope="module")
+def renderer():
+    fig = Figure(dpi=100)
+    return fig, FigureCanvasAgg(fig).get_renderer()
+
+
+class TestTextMetrics:
+    @pytest.mark.parametrize("fontsize", [12, 22])
+    @pytest.mark.parametrize("weight", ["normal", "bold"])
+    def test_close_to_matplotlib(self, renderer, fontsize, weight):
+        fig, r = renderer
+        expected = np.array(
+            [
+                fig.text(0, 0, text, fontsize=fontsize, fontweight=weight)
+                .get_window_extent(r)
+                .width
+                for text in TEXTS
+            ]
+        )
+        widths = TextMetrics(dpi=100).widths(TEXTS, fontsize, weight)
+        # kerning pulls pairs such as "AV" together, which the advances
+        # don't, so text is never measured narrower than it is drawn
+        assert (widths >= expected - 1).all()
+        assert (widths <= expected * 1.06 + 1).all()
+
+    def test_multiline(self):
+        metrics = TextMetrics()
+        widths = metrics.widths(["abc\nabcdef\n", "abcdef", "", "x\n\nx"], 12)
+        assert widths[0] == widths[1] == metrics.width("abcdef", 12)
+        assert widths[2] == 0
+        assert widths[3] == metrics.width("x", 12)
+
+    def test_repeated_texts(self):
+        metrics = TextMetrics()
+        texts = ["abc", "de\nf", "abc", "de\nf", "ghij"]
+        widths = metrics.widths(texts, 12)
+        assert widths.tolist() == [metrics.width(text, 12) for text in texts]
+        assert len(metrics.cache) == 3
+        # the cached widths are returned on the next pass
+        assert metrics.widths(texts, 12).tolist() == widths.tolist()
+
+    def test_lru_eviction(self):
+        metrics = TextMetrics(maxsize=2)
+        metrics.widths(["a", "b"], 12)
+        # "a" becomes the most recently used, leaving "b" to be evicted
+        metrics.width("a", 12)
+        metrics.width("c", 12)
+        assert list(metrics.cache) == [
+            ("a", 12, "normal", None),
+            ("c", 12, "normal", None),
+        ]
+
+    def test_cache_key(self):
+        metrics = TextMetrics()
+        normal = metrics.width("abc", 12)
+        assert metrics.width("abc", 12, "bold") > normal
+        assert metrics.width("abc", 24) > normal
+        assert len(metrics.cache) == 3
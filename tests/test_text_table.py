@@ -0,0 +1,55 @@
+from jupyter_to_medium._preprocesors import replace_md_tables, store_table_image
+from jupyter_to_medium._text_table import TextTable, TextTableMaker
+
+HTML = (
+    "<table><thead><tr><th></th><th>name</th><th>value</th><th>c</th><th>d</th></tr></thead>"
+    "<tbody><tr><th>0</th><td style='text-align:left'>a very long name</td><td>1.5</td>"
+    "<td>x</td><td>y</td></tr>"
+    "<tr><th>1</th><td style='text-align:left'>b</td><td>10</td><td>x</td><td>y</td></tr></tbody></table>"
+)
+
+
+class TestTextTableMaker:
+    def test_alignment_and_ellipsis(self):
+        text = TextTableMaker(max_col_width=8).run(HTML)
+        assert isinstance(text, TextTable)
+        assert text.splitlines() == [
+            "       name  value  c  d",
+            "------------------------",
+            "0  a very …    1.5  x  y",
+            "1  b            10  x  y",
+        ]
+
+    def test_columns_past_max_width_are_dropped(self):
+        text = TextTableMaker(max_col_width=8, max_width=20).run(HTML)
+        assert text.splitlines() == [
+            "       name  ...",
+            "----------------",
+            "0  a very …  ...",
+            "1  b         ...",
+        ]
+        assert all(len(line) <= 20 for line in text.splitlines())
+
+    def test_to_markdown(self):
+        assert TextTable("a  b").to_markdown() == "```\na  b\n```"
+
+
+class TestTextTablePreprocessing:
+    def test_markdown_table(self):
+        cell = {"source": "Before\n\n| a | b |\n|---|---|\n| 1 | 2 |\n\nAfter"}
+        image_data_dict = {}
+        # the html mistune makes of the table depends on its version
+        replace_md_tables(
+            image_data_dict, cell, lambda html: TextTable("a  b\n----\n1  2"), 3
+        )
+        assert image_data_dict == {}
+        assert cell["source"] == "Before\n\n```\na  b\n----\n1  2\n```\nAfter"
+
+    def test_dataframe_output(self):
+        output = {"output_type": "execute_result", "data": {"text/html": HTML}}
+        outputs = [output]
+        store_table_image(outputs, output, TextTableMaker().run(HTML))
+        assert outputs == [output]
+        assert output["data"] == {
+            "text/markdown": "```\n" + TextTableMaker().run(HTML) + "\n```"
+        }